@@ -1,90 +1,326 @@
 import asyncio
 import functools
 import inspect
+import random
 import time
 from contextlib import contextmanager
 from inspect import Parameter
-from typing import Callable, Union, TypeVar, Any
+from typing import Callable, Iterator, Optional, Tuple, Type, Union, TypeVar, Any
 
-from pythonic_toolbox.decorators.decorator_utils import decorate_auto_use_params, decorate_sync_async
+from pythonic_toolbox.decorators.decorator_utils import (decorate_auto_use_params, decorate_sync_async,
+                                                         method_synchronized)
+from pythonic_toolbox.utils.metric_utils import LatencyHistogram, SpanTracer
 
 T = TypeVar("T")
 
 
 def ignore_unexpected_kwargs(func: Callable[..., T]) -> Callable[..., T]:
-    def filter_kwargs(kwargs: dict) -> dict:
-        sig = inspect.signature(func)
-        # Parameter.VAR_KEYWORD - a dict of keyword arguments that aren't bound to any other
-        if any(map(lambda p: p.kind == Parameter.VAR_KEYWORD, sig.parameters.values())):
-            # if **kwargs exists, return directly
-            return kwargs
-
-        _params = list(filter(lambda p: p.kind in {Parameter.KEYWORD_ONLY, Parameter.POSITIONAL_OR_KEYWORD},
-                              sig.parameters.values()))
-
-        res_kwargs = {
-            param.name: kwargs[param.name]
-            for param in _params if param.name in kwargs
-        }
-        return res_kwargs
+    """
+    Drop keyword arguments not accepted by func, the signature is inspected once at decoration time,
+    calls without unexpected keyword arguments are passed through without filtering
+    """
+    params = inspect.signature(func).parameters.values()
+    # Parameter.VAR_KEYWORD - a dict of keyword arguments that aren't bound to any other
+    if any(p.kind == Parameter.VAR_KEYWORD for p in params):
+        # if **kwargs exists, pass all through
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    accepted = frozenset(p.name for p in params
+                         if p.kind in {Parameter.KEYWORD_ONLY, Parameter.POSITIONAL_OR_KEYWORD})
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs) -> T:
-        kwargs = filter_kwargs(kwargs)
-        return func(*args, **kwargs)
+        if kwargs.keys() <= accepted:
+            return func(*args, **kwargs)
+        return func(*args, **{k: kwargs[k] for k in accepted.intersection(kwargs)})
 
     return wrapper
 
 
+def _print_sink(func: Callable, seconds: float, args: tuple, kwargs: dict) -> None:
+    print(f'{func.__name__} took {seconds:.2} second(s) args {args}, kwargs {kwargs}')
+
+
 @decorate_auto_use_params
-def duration(func: Callable[..., T], time_threshold: float = 1) -> Callable[..., Any]:
+def duration(func: Callable[..., T], time_threshold: float = 1,
+             histogram: Optional[LatencyHistogram] = None, sample_rate: float = 1,
+             sink: Optional[Callable[[Callable, float, tuple, dict], None]] = None,
+             tracer: Optional[SpanTracer] = None) -> Callable[..., Any]:
+    """
+    Measure time cost of func, call sink(func, seconds, args, kwargs) if a call takes time_threshold seconds
+    or more (print by default, disabled if time_threshold <= 0, see also logging_sink), and record every cost
+    into histogram if given. If tracer is given, nested calls decorated with the same tracer build span trees
+    with self and total time. Only sample_rate of calls are measured, the rest skip the timing entirely
+    """
+    if not 0 <= sample_rate <= 1:
+        raise ValueError('sample_rate should be in [0, 1]')
+    if sink is None:
+        sink = _print_sink
+    # wrappers are written out instead of using decorate_sync_async and a context manager,
+    # which costs about 3 times of the overhead per call
+    perf_counter, rand = time.perf_counter, random.random
+    sample_all = sample_rate >= 1
+    record = histogram.record if histogram is not None else None
+    span_name = getattr(func, '__qualname__', func.__name__)
+
+    if asyncio.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            if not sample_all and rand() >= sample_rate:
+                return await func(*args, **kwargs)
+            span = tracer.start_span(span_name) if tracer is not None else None
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                total = perf_counter() - start
+                if span is not None:
+                    tracer.end_span(span)
+                if record is not None:
+                    record(total)
+                if 0 < time_threshold <= total:
+                    sink(func, total, args, kwargs)
+    else:
+        def wrapper(*args, **kwargs):
+            if not sample_all and rand() >= sample_rate:
+                return func(*args, **kwargs)
+            span = tracer.start_span(span_name) if tracer is not None else None
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                total = perf_counter() - start
+                if span is not None:
+                    tracer.end_span(span)
+                if record is not None:
+                    record(total)
+                if 0 < time_threshold <= total:
+                    sink(func, total, args, kwargs)
+
+    wrapper = functools.wraps(func)(wrapper)
+    wrapper.histogram = histogram
+    wrapper.tracer = tracer
+    return wrapper
+
+
+def _backoff_delays(delay: Union[int, float], factor: Union[int, float],
+                    jitter: Optional[str] = None, max_delay: Optional[Union[int, float]] = None) -> Iterator[float]:
+    """
+    Delays between retries, exponential backoff by factor if jitter is None,
+    'full' for a random delay up to the exponential one, 'decorrelated' for a random delay between delay and
+    3 times of the previous one, each capped by max_delay
+    """
+    cap = float('inf') if max_delay is None else max_delay
+    _delay = prev_delay = delay
+    while True:
+        if jitter is None:
+            yield min(_delay, cap)
+        elif jitter == 'full':
+            yield random.uniform(0, min(_delay, cap))
+        else:
+            prev_delay = min(random.uniform(delay, prev_delay * 3), cap)
+            yield prev_delay
+        # stop growing once capped, to avoid an overflow of float
+        if _delay < cap:
+            _delay *= factor
+
+
+class RetryBudget:
+    """
+    Token bucket shared by retry decorated functions, each call deposits ratio token,
+    and each retry withdraws one, so that retries are at most about ratio of calls (plus initial_tokens),
+    and a slow backend won't get multiplied load. Thread-safe, counters can be read for metrics
+    """
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 100, initial_tokens: float = 10):
+        if ratio < 0:
+            raise ValueError('ratio should be non-negative')
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min(initial_tokens, max_tokens)
+        self.calls = 0
+        self.retries = 0
+        self.rejected_retries = 0
+
+    @method_synchronized
+    def deposit(self) -> None:
+        self.calls += 1
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    @method_synchronized
+    def try_withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.rejected_retries += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+
+class CircuitBreakerOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker, opened after failure_threshold consecutive failures (exceptions), then calls fail fast
+    with CircuitBreakerOpenError, until recovery_timeout seconds later, when half_open_max_calls trial calls
+    are let through, the breaker is closed if they succeed, or opened again if any fails.
+    Thread-safe, state and counters can be read for metrics
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: Union[int, float] = 30,
+                 half_open_max_calls: int = 1, exceptions: Tuple[Type[BaseException], ...] = (Exception,)):
+        if not isinstance(failure_threshold, int) or failure_threshold <= 0:
+            raise ValueError('failure_threshold should be positive integer')
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.exceptions = exceptions
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.failure_count = 0
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    @method_synchronized
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    @method_synchronized
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._half_open_calls >= self.half_open_max_calls):
+            self.rejected_count += 1
+            raise CircuitBreakerOpenError(f'circuit breaker is {state}')
+        if state == self.HALF_OPEN:
+            self._half_open_calls += 1
+
+    @method_synchronized
+    def on_success(self) -> None:
+        self.failure_count = 0
+        self._state = self.CLOSED
+
+    @method_synchronized
+    def release(self) -> None:
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    @method_synchronized
+    def on_failure(self) -> bool:
+        """returns True if the breaker is opened by this failure"""
+        self.failure_count += 1
+        if self._state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+            opened = self._state != self.OPEN
+            if opened:
+                self.opened_count += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            return opened
+        return False
+
+
+@decorate_auto_use_params
+def circuit_breaker(func: Callable[..., T], breaker: Optional[CircuitBreaker] = None,
+                    failure_threshold: int = 5, recovery_timeout: Union[int, float] = 30,
+                    exceptions: Tuple[Type[BaseException], ...] = (Exception,)) -> Callable[..., T]:
+    """
+    Guard func with breaker, which can be shared by functions calling the same backend,
+    or a new one created by the rest params. The call opening the breaker raises CircuitBreakerOpenError
+    from the original exception, put it inside retry, so that retry stops once it's open without sleeping
+    """
+    if breaker is None:
+        breaker = CircuitBreaker(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout,
+                                 exceptions=exceptions)
+
     @contextmanager
     def decorating_context(func: Callable[..., T], *args, **kwargs):
-        start = time.perf_counter()
+        breaker.before_call()
         try:
             yield args, kwargs
-        except Exception as e:
-            raise e
-        finally:
-            if time_threshold <= 0:
-                return
-            end = time.perf_counter()
-            total = end - start
-            if total >= time_threshold:
-                print(f'{func.__name__} took {total:.2} second(s) args {args}, kwargs {kwargs}')
+        except breaker.exceptions as e:
+            if breaker.on_failure():
+                raise CircuitBreakerOpenError('circuit breaker is open') from e
+            raise
+        except Exception:
+            # not counted as failure, the backend did respond
+            breaker.on_success()
+            raise
+        except BaseException:
+            # e.g. cancelled, neither success nor failure
+            breaker.release()
+            raise
+        else:
+            breaker.on_success()
 
-    return decorate_sync_async(decorating_context, func)
+    wrapper = decorate_sync_async(decorating_context, func)
+    wrapper.circuit_breaker = breaker
+    return wrapper
 
 
 @decorate_auto_use_params
 def retry(func: Callable[..., T], tries: int = 1,
-          delay: Union[int, float] = 1, factor: Union[int, float] = 2) -> Callable[..., T]:
+          delay: Union[int, float] = 1, factor: Union[int, float] = 2,
+          jitter: Optional[str] = None, max_delay: Optional[Union[int, float]] = None,
+          exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+          deadline: Optional[Union[int, float]] = None,
+          budget: Optional[RetryBudget] = None) -> Callable[..., T]:
+    """
+    Retry func at most tries times if it raises one of exceptions, with exponential backoff between retries,
+    see _backoff_delays for jitter and max_delay. Give up and raise the last exception if the next retry
+    would start after deadline seconds since the first call, or budget has no token left for it,
+    or a circuit breaker is open. Backoff of async func doesn't block the event loop
+    """
+    if not isinstance(tries, int) or tries < 0:
+        raise ValueError('tries should be non-negative integer')
+    if jitter not in (None, 'full', 'decorrelated'):
+        raise ValueError("jitter should be None, 'full' or 'decorrelated'")
+
+    def should_retry(e: BaseException, remaining_tries: int, _delay: float, deadline_at: Optional[float]) -> bool:
+        if remaining_tries == 0 or isinstance(e, CircuitBreakerOpenError):
+            return False
+        if deadline_at is not None and time.monotonic() + _delay > deadline_at:
+            return False
+        return budget is None or budget.try_withdraw()
+
     if asyncio.iscoroutinefunction(func):
         async def decorated(*args, **kwargs):
-            _tries, _delay = tries, delay
-            _tries += 1  # ensure we call func at least once
-            while _tries > 0:
+            deadline_at = None if deadline is None else time.monotonic() + deadline
+            if budget is not None:
+                budget.deposit()
+            delays = _backoff_delays(delay, factor, jitter, max_delay)
+            # ensure we call func at least once
+            for remaining_tries in range(tries, -1, -1):
                 try:
                     return await func(*args, **kwargs)
-                except Exception as e:
-                    _tries -= 1
-                    if _tries == 0:
+                except exceptions as e:
+                    _delay = next(delays)
+                    if not should_retry(e, remaining_tries, _delay, deadline_at):
                         raise e
-                    time.sleep(_delay)
-                    _delay *= factor
+                    await asyncio.sleep(_delay)
     else:
         def decorated(*args, **kwargs):
-            _tries, _delay = tries, delay
-            _tries += 1  # ensure we call func at least once
-            while _tries > 0:
+            deadline_at = None if deadline is None else time.monotonic() + deadline
+            if budget is not None:
+                budget.deposit()
+            delays = _backoff_delays(delay, factor, jitter, max_delay)
+            # ensure we call func at least once
+            for remaining_tries in range(tries, -1, -1):
                 try:
                     return func(*args, **kwargs)
-                except Exception as e:
-                    _tries -= 1
-                    if _tries == 0:
+                except exceptions as e:
+                    _delay = next(delays)
+                    if not should_retry(e, remaining_tries, _delay, deadline_at):
                         raise e
                     time.sleep(_delay)
-                    _delay *= factor
-            return func(*args, **kwargs)
 
     return functools.wraps(func)(decorated)
@@ -1,4 +1,11 @@
+import functools
 import sys
+import types
+
+
+def _no_trace(*args, **keys):
+    # global trace function which traces nothing, only needed for frame.f_trace to be called
+    return None
 
 
 class SkipContext:
@@ -8,16 +15,51 @@ class SkipContext:
     def __init__(self, skip: bool):
         self.skip = skip
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # subclasses may override __exit__ without calling super, make sure tracing is always restored
+        if '__exit__' in cls.__dict__:
+            exit_func = cls.__dict__['__exit__']
+
+            @functools.wraps(exit_func)
+            def __exit__(self, type, value, traceback):
+                self._restore_trace(done=True)
+                return exit_func(self, type, value, traceback)
+
+            cls.__exit__ = __exit__
+
     def __enter__(self):
         if self.skip:
-            sys.settrace(lambda *args, **keys: None)
             frame = sys._getframe(1)
+            # keep tracers already installed, e.g. by debugger, coverage or profiler
+            self._prev_global_trace = sys.gettrace()
+            self._prev_frame_trace = frame.f_trace
+            self._frame = frame
+            # frame.f_trace is only called by the trampoline of sys.settrace, a tracer set in C
+            # (e.g. CTracer of coverage) won't call it, so a python level one is installed for the skipped block
+            if not isinstance(self._prev_global_trace, (types.FunctionType, types.MethodType)):
+                sys.settrace(_no_trace)
             frame.f_trace = self.trace
 
+    def _restore_trace(self, done: bool = False):
+        frame = getattr(self, '_frame', None)
+        if frame is None:
+            return
+        prev_global_trace = self._prev_global_trace
+        # a tracer set in C can only be restored through sys.settrace if callable, e.g. CTracer of coverage,
+        # which installs itself in C again on the next call event
+        sys.settrace(prev_global_trace if callable(prev_global_trace) else None)
+        frame.f_trace = self._prev_frame_trace
+        if done:
+            self._frame = None
+
     def trace(self, frame, event, arg):
+        self._restore_trace()
+        # raising in a trace function unsets the tracers of the thread again, so they are restored on exit as well
         raise self.SkipContentException()
 
     def __exit__(self, type, value, traceback):
+        self._restore_trace(done=True)
         if type is None:
             return  # No exception
         if issubclass(type, self.SkipContentException):
@@ -1,17 +1,505 @@
+import asyncio
 import itertools
+import pickle
+import tempfile
+import threading
 from collections import deque
-from typing import Deque, Tuple, TypeVar
+from functools import singledispatch
+from typing import IO, Any, Callable, Deque, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
 import sys
 
 T = TypeVar("T")
 
 
-def deque_split(queue: Deque[T], num: int) -> Tuple[Deque[T], Deque[T]]:
+class IndexedDeque(Generic[T]):
+    """
+    Deque stored as a list of blocks (lists of about block_size items), which supports index access,
+    pop_at and insert_at in O(log n) by a Fenwick tree over block sizes, besides amortized O(1)
+    append/appendleft/pop/popleft. The tree is rebuilt lazily only after blocks are added or removed
+    """
+
+    def __init__(self, iterable: Iterable[T] = (), block_size: int = 1000):
+        if not isinstance(block_size, int) or block_size <= 1:
+            raise ValueError('block_size should be integer greater than 1')
+        self.block_size = block_size
+        self._blocks: List[List[T]] = []
+        self._len = 0
+        # Fenwick tree over sizes of blocks, None if blocks are added or removed since built
+        self._tree: Optional[List[int]] = None
+        self.extend(iterable)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[T]:
+        return itertools.chain.from_iterable(self._blocks)
+
+    def __reversed__(self) -> Iterator[T]:
+        return itertools.chain.from_iterable(map(reversed, reversed(self._blocks)))
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self)!r})'
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (IndexedDeque, deque)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def _build_tree(self) -> List[int]:
+        tree = [0]
+        tree.extend(map(len, self._blocks))
+        size = len(tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        return tree
+
+    def _update_tree(self, block_idx: int, delta: int) -> None:
+        tree = self._tree
+        if tree is None:
+            return
+        i, size = block_idx + 1, len(tree)
+        while i < size:
+            tree[i] += delta
+            i += i & -i
+
+    def _locate(self, idx: int) -> Tuple[int, int]:
+        """index of block and offset in block of the idx-th item, 0 <= idx < len(self)"""
+        blocks = self._blocks
+        first_len = len(blocks[0])
+        if idx < first_len:
+            return 0, idx
+        last_start = self._len - len(blocks[-1])
+        if idx >= last_start:
+            return len(blocks) - 1, idx - last_start
+
+        tree = self._tree if self._tree is not None else self._build_tree()
+        pos, rest = 0, idx
+        bit = 1 << ((len(tree) - 1).bit_length() - 1)
+        while bit:
+            nxt = pos + bit
+            if nxt < len(tree) and tree[nxt] <= rest:
+                pos = nxt
+                rest -= tree[nxt]
+            bit >>= 1
+        return pos, rest
+
+    def _normalize_index(self, idx: int, error_msg: str) -> int:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError(error_msg)
+        return idx
+
+    def __getitem__(self, idx: int) -> T:
+        block_idx, offset = self._locate(self._normalize_index(idx, 'deque index out of range'))
+        return self._blocks[block_idx][offset]
+
+    def __setitem__(self, idx: int, value: T) -> None:
+        block_idx, offset = self._locate(self._normalize_index(idx, 'deque index out of range'))
+        self._blocks[block_idx][offset] = value
+
+    def __delitem__(self, idx: int) -> None:
+        self.pop_at(idx)
+
+    def append(self, value: T) -> None:
+        blocks = self._blocks
+        if blocks and len(blocks[-1]) < self.block_size:
+            blocks[-1].append(value)
+            self._update_tree(len(blocks) - 1, 1)
+        else:
+            blocks.append([value])
+            self._tree = None
+        self._len += 1
+
+    def appendleft(self, value: T) -> None:
+        blocks = self._blocks
+        if blocks and len(blocks[0]) < self.block_size:
+            blocks[0].insert(0, value)
+            self._update_tree(0, 1)
+        else:
+            blocks.insert(0, [value])
+            self._tree = None
+        self._len += 1
+
+    def extend(self, iterable: Iterable[T]) -> None:
+        values = list(iterable)
+        if not values:
+            return
+        blocks, block_size = self._blocks, self.block_size
+        start = 0
+        if blocks and len(blocks[-1]) < block_size:
+            start = block_size - len(blocks[-1])
+            blocks[-1].extend(values[:start])
+        blocks.extend(values[i:i + block_size] for i in range(start, len(values), block_size))
+        self._len += len(values)
+        self._tree = None
+
+    def extendleft(self, iterable: Iterable[T]) -> None:
+        # same as deque.extendleft, values end up in reversed order
+        values = list(iterable)
+        if not values:
+            return
+        values.reverse()
+        blocks, block_size = self._blocks, self.block_size
+        end = len(values)
+        if blocks and len(blocks[0]) < block_size:
+            end = max(end - (block_size - len(blocks[0])), 0)
+            blocks[0][:0] = values[end:]
+        blocks[:0] = [values[i:min(i + block_size, end)] for i in range(0, end, block_size)]
+        self._len += len(values)
+        self._tree = None
+
+    def pop(self) -> T:
+        if not self._len:
+            raise IndexError('pop from an empty deque')
+        blocks = self._blocks
+        value = blocks[-1].pop()
+        if blocks[-1]:
+            self._update_tree(len(blocks) - 1, -1)
+        else:
+            blocks.pop()
+            self._tree = None
+        self._len -= 1
+        return value
+
+    def popleft(self) -> T:
+        if not self._len:
+            raise IndexError('pop from an empty deque')
+        blocks = self._blocks
+        value = blocks[0].pop(0)
+        if blocks[0]:
+            self._update_tree(0, -1)
+        else:
+            del blocks[0]
+            self._tree = None
+        self._len -= 1
+        return value
+
+    def pop_at(self, idx: int) -> T:
+        if not self._len:
+            raise IndexError('pop from empty deque')
+        block_idx, offset = self._locate(self._normalize_index(idx, 'index out of range'))
+        blocks = self._blocks
+        block = blocks[block_idx]
+        value = block.pop(offset)
+        self._len -= 1
+        if not block:
+            del blocks[block_idx]
+            self._tree = None
+        elif block_idx + 1 < len(blocks) and len(block) + len(blocks[block_idx + 1]) <= self.block_size // 2:
+            # merge small neighbours, so that the number of blocks stays O(n / block_size)
+            block.extend(blocks.pop(block_idx + 1))
+            self._tree = None
+        else:
+            self._update_tree(block_idx, -1)
+        return value
+
+    def insert_at(self, idx: int, value: T) -> None:
+        """same as list.insert, idx out of range is clamped"""
+        if idx < 0:
+            idx = max(idx + self._len, 0)
+        if idx >= self._len:
+            self.append(value)
+            return
+        if idx == 0:
+            self.appendleft(value)
+            return
+        block_idx, offset = self._locate(idx)
+        blocks = self._blocks
+        block = blocks[block_idx]
+        block.insert(offset, value)
+        self._len += 1
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            blocks[block_idx:block_idx + 1] = [block[:half], block[half:]]
+            self._tree = None
+        else:
+            self._update_tree(block_idx, 1)
+
+    def clear(self) -> None:
+        self._blocks = []
+        self._len = 0
+        self._tree = None
+
+    def split(self, num: int) -> 'IndexedDeque[T]':
+        """
+        Split in place, self keeps the first num items, and the rest are moved to the returned IndexedDeque.
+        Blocks are moved instead of items, it costs O(block_size + number of blocks)
+        """
+        num = min(max(num, 0), self._len)
+        tail = self.__class__(block_size=self.block_size)
+        if num == self._len:
+            return tail
+
+        blocks = self._blocks
+        block_idx, offset = self._locate(num) if num else (0, 0)
+        tail_blocks = []
+        if offset:
+            block = blocks[block_idx]
+            tail_blocks.append(block[offset:])
+            del block[offset:]
+            block_idx += 1
+        tail_blocks.extend(itertools.islice(blocks, block_idx, None))
+        del blocks[block_idx:]
+
+        tail._blocks, tail._len = tail_blocks, self._len - num
+        self._len = num
+        self._tree = None
+        return tail
+
+    def concat(self, other: 'IndexedDeque[T]') -> None:
+        """move all items of other to the end of self in O(block_size + number of blocks), other becomes empty"""
+        if other is self:
+            raise ValueError('cannot concat IndexedDeque to itself')
+        if not other._len:
+            return
+        blocks, other_blocks = self._blocks, other._blocks
+        if blocks and len(blocks[-1]) + len(other_blocks[0]) <= self.block_size:
+            # avoid a small block in the middle
+            blocks[-1].extend(other_blocks[0])
+            blocks.extend(itertools.islice(other_blocks, 1, None))
+        else:
+            blocks.extend(other_blocks)
+        self._len += other._len
+        self._tree = None
+        other.clear()
+
+
+class SpillDeque(Generic[T]):
+    """
+    Deque under a memory budget, items near the head and the tail are kept in memory, and once their total size
+    (measured by sizeof, which is shallow by default) exceeds max_memory_bytes, items in the middle are spilled
+    to a temporary file in batches, a batch is a list of items serialized by dumps and loaded back by loads
+    when it's reached from either end. The file is compacted once its garbage (batches loaded back or rewritten)
+    outgrows the spilled batches, so disk usage (disk_bytes) is bounded by about twice of the spilled size
+    """
+
+    def __init__(self, iterable: Iterable[T] = (),
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 dumps: Callable[[List[T]], bytes] = pickle.dumps,
+                 loads: Callable[[bytes], List[T]] = pickle.loads,
+                 sizeof: Callable[[Any], int] = sys.getsizeof,
+                 tmp_dir: Optional[str] = None):
+        if not isinstance(max_memory_bytes, int) or max_memory_bytes <= 0:
+            raise ValueError('max_memory_bytes should be positive integer')
+        self.max_memory_bytes = max_memory_bytes
+        self.dumps, self.loads, self.sizeof = dumps, loads, sizeof
+        self.tmp_dir = tmp_dir
+        self._head: Deque[T] = deque()
+        self._tail: Deque[T] = deque()
+        self.memory_bytes = 0
+        # (offset, size, item number) of spilled batches in the file, in the order of items
+        self._batches: Deque[Tuple[int, int, int]] = deque()
+        self.spilled_num = 0
+        self._file: Optional[IO[bytes]] = None
+        # size of the file, and of the batches still in use
+        self.disk_bytes = self._live_bytes = 0
+        self.extend(iterable)
+
+    def __len__(self) -> int:
+        return len(self._head) + self.spilled_num + len(self._tail)
+
+    def __iter__(self) -> Iterator[T]:
+        spilled = itertools.chain.from_iterable(map(self._read, list(self._batches)))
+        return itertools.chain(self._head, spilled, self._tail)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(len={len(self)}, spilled_num={self.spilled_num})'
+
+    def __enter__(self) -> 'SpillDeque[T]':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._head.clear()
+        self._tail.clear()
+        self._batches.clear()
+        self.memory_bytes = self.spilled_num = 0
+        self.disk_bytes = self._live_bytes = 0
+
+    def _new_like(self, iterable: Iterable[T] = ()) -> 'SpillDeque[T]':
+        return self.__class__(iterable, max_memory_bytes=self.max_memory_bytes, dumps=self.dumps, loads=self.loads,
+                              sizeof=self.sizeof, tmp_dir=self.tmp_dir)
+
+    def _write(self, items: List[T]) -> Tuple[int, int, int]:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.tmp_dir)
+        data = self.dumps(items)
+        # append only, batches loaded back or rewritten by pop_at leave garbage until the file is compacted
+        offset = self.disk_bytes
+        self._file.seek(offset)
+        self._file.write(data)
+        self.disk_bytes += len(data)
+        self._live_bytes += len(data)
+        return offset, len(data), len(items)
+
+    def _read(self, batch: Tuple[int, int, int]) -> List[T]:
+        offset, size, __ = batch
+        self._file.seek(offset)
+        return self.loads(self._file.read(size))
+
+    def _spill(self) -> None:
+        head, tail = self._head, self._tail
+        # a single item larger than the budget is kept in memory
+        while self.memory_bytes > self.max_memory_bytes and (len(head) > 1 or len(tail) > 1):
+            # spill half of the larger end, from its side next to the spilled ones to keep the order
+            if len(tail) >= len(head):
+                items = [tail.popleft() for __ in range(len(tail) // 2)]
+                self._batches.append(self._write(items))
+            else:
+                items = [head.pop() for __ in range(len(head) // 2)]
+                items.reverse()
+                self._batches.appendleft(self._write(items))
+            self.spilled_num += len(items)
+            self.memory_bytes -= sum(map(self.sizeof, items))
+
+    def _load(self, batch: Tuple[int, int, int]) -> List[T]:
+        items = self._read(batch)
+        self.spilled_num -= len(items)
+        self.memory_bytes += sum(map(self.sizeof, items))
+        self._discard(batch)
+        return items
+
+    def _discard(self, batch: Tuple[int, int, int]) -> None:
+        # batch is no longer in _batches, reclaim disk space once garbage outgrows the batches in use
+        self._live_bytes -= batch[1]
+        if not self._batches:
+            self._file.seek(0)
+            self._file.truncate()
+            self.disk_bytes = 0
+        elif self.disk_bytes - self._live_bytes > self._live_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        # copy batches in use to a new file, the cost is amortized by the garbage accumulated since the last one
+        old_file, new_file = self._file, tempfile.TemporaryFile(dir=self.tmp_dir)
+        try:
+            batches, offset = deque(), 0
+            for batch_offset, size, num in self._batches:
+                old_file.seek(batch_offset)
+                new_file.write(old_file.read(size))
+                batches.append((offset, size, num))
+                offset += size
+        except BaseException:
+            new_file.close()
+            raise
+        old_file.close()
+        self._file, self._batches = new_file, batches
+        self.disk_bytes = offset
+
+    def append(self, value: T) -> None:
+        self._tail.append(value)
+        self.memory_bytes += self.sizeof(value)
+        if self.memory_bytes > self.max_memory_bytes:
+            self._spill()
+
+    def appendleft(self, value: T) -> None:
+        self._head.appendleft(value)
+        self.memory_bytes += self.sizeof(value)
+        if self.memory_bytes > self.max_memory_bytes:
+            self._spill()
+
+    def extend(self, iterable: Iterable[T]) -> None:
+        for value in iterable:
+            self.append(value)
+
+    def popleft(self) -> T:
+        if not self._head:
+            if self._batches:
+                self._head.extend(self._load(self._batches.popleft()))
+            elif not self._tail:
+                raise IndexError('pop from an empty deque')
+            else:
+                value = self._tail.popleft()
+                self.memory_bytes -= self.sizeof(value)
+                return value
+        value = self._head.popleft()
+        self.memory_bytes -= self.sizeof(value)
+        return value
+
+    def pop(self) -> T:
+        if not self._tail:
+            if self._batches:
+                self._tail.extendleft(reversed(self._load(self._batches.pop())))
+            elif not self._head:
+                raise IndexError('pop from an empty deque')
+            else:
+                value = self._head.pop()
+                self.memory_bytes -= self.sizeof(value)
+                return value
+        value = self._tail.pop()
+        self.memory_bytes -= self.sizeof(value)
+        return value
+
+    def pop_at(self, idx: int) -> T:
+        if not len(self):
+            raise IndexError('pop from empty deque')
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('index out of range')
+
+        head_num = len(self._head)
+        if idx < head_num:
+            value = deque_pop_any(self._head, idx)
+        elif idx < head_num + self.spilled_num:
+            # only the batch containing the item is loaded and rewritten
+            rest = idx - head_num
+            for pos, batch in enumerate(self._batches):
+                if rest < batch[2]:
+                    break
+                rest -= batch[2]
+            items = self._read(batch)
+            value = items.pop(rest)
+            if items:
+                self._batches[pos] = self._write(items)
+            else:
+                del self._batches[pos]
+            self._discard(batch)
+            self.spilled_num -= 1
+            return value
+        else:
+            value = deque_pop_any(self._tail, idx - head_num - self.spilled_num)
+        self.memory_bytes -= self.sizeof(value)
+        return value
+
+
+def _check_split_num(num: int) -> None:
     if not 0 <= num <= sys.maxsize:
         raise ValueError('num must be integer: 0 <= num <= sys.maxsize')
+
+
+@singledispatch
+def deque_split(queue: Deque[T], num: int) -> Tuple[Deque[T], Deque[T]]:
+    _check_split_num(num)
     return deque(itertools.islice(queue, num)), deque(itertools.islice(queue, num, len(queue)))
 
 
+@deque_split.register(IndexedDeque)
+def _(queue: IndexedDeque, num: int) -> Tuple[IndexedDeque, IndexedDeque]:
+    # split in place without copying items, queue itself is returned as the first part
+    _check_split_num(num)
+    tail = queue.split(num)
+    return queue, tail
+
+
+@deque_split.register(SpillDeque)
+def _(queue: SpillDeque, num: int) -> Tuple[SpillDeque, SpillDeque]:
+    # items are streamed into two new SpillDeques under the same budget, one spilled batch at a time
+    _check_split_num(num)
+    items = iter(queue)
+    return queue._new_like(itertools.islice(items, num)), queue._new_like(items)
+
+
+@singledispatch
 def deque_pop_any(queue: Deque[T], idx: int) -> T:
     if len(queue) == 0:
         raise IndexError('pop from empty deque')
@@ -21,3 +509,128 @@ def deque_pop_any(queue: Deque[T], idx: int) -> T:
     res = queue.popleft()
     queue.rotate(idx)
     return res
+
+
+@deque_pop_any.register(IndexedDeque)
+def _(queue: IndexedDeque, idx: int) -> T:
+    if len(queue) == 0:
+        raise IndexError('pop from empty deque')
+    if not 0 <= idx <= len(queue) - 1:
+        raise IndexError('index out of range')
+    return queue.pop_at(idx)
+
+
+@deque_pop_any.register(SpillDeque)
+def _(queue: SpillDeque, idx: int) -> T:
+    if len(queue) == 0:
+        raise IndexError('pop from empty deque')
+    if not 0 <= idx <= len(queue) - 1:
+        raise IndexError('index out of range')
+    return queue.pop_at(idx)
+
+
+class WorkStealingDeque(Generic[T]):
+    """
+    Work-stealing deque for an in-process scheduler, the owner pushes and pops items at the right end,
+    and thieves steal batches from the left end, i.e. the first part of deque_split.
+    Owner operations take no lock but rely on append/pop of collections.deque being atomic,
+    only thieves are serialized by a lock, so the owner never waits for them
+    """
+
+    def __init__(self, iterable: Iterable[T] = ()):
+        self._queue: Deque[T] = deque(iterable)
+        self._steal_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self._queue)!r})'
+
+    def push(self, item: T) -> None:
+        self._queue.append(item)
+
+    def push_many(self, items: Iterable[T]) -> None:
+        self._queue.extend(items)
+
+    def pop(self) -> T:
+        """pop the latest pushed item, raise IndexError if empty"""
+        return self._queue.pop()
+
+    def steal(self, num: Optional[int] = None) -> Deque[T]:
+        """steal at most num oldest items, half of the items (rounded up) by default"""
+        if num is not None:
+            _check_split_num(num)
+        with self._steal_lock:
+            queue = self._queue
+            if num is None:
+                num = (len(queue) + 1) // 2
+            stolen: Deque[T] = deque()
+            popleft = queue.popleft
+            for __ in range(num):
+                try:
+                    stolen.append(popleft())
+                except IndexError:
+                    # the owner popped the rest concurrently
+                    break
+            return stolen
+
+
+class AsyncWorkStealingDeque(Generic[T]):
+    """
+    asyncio version of WorkStealingDeque, which is not thread-safe, get waits until an item is pushed,
+    and steal takes the oldest items without waiting
+    """
+
+    def __init__(self, iterable: Iterable[T] = ()):
+        self._queue: Deque[T] = deque(iterable)
+        self._getters: Deque[asyncio.Future] = deque()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self._queue)!r})'
+
+    def _wakeup_next(self) -> None:
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def put_nowait(self, item: T) -> None:
+        self._queue.append(item)
+        self._wakeup_next()
+
+    def get_nowait(self) -> T:
+        """pop the latest pushed item, raise IndexError if empty"""
+        return self._queue.pop()
+
+    async def get(self) -> T:
+        while not self._queue:
+            getter = asyncio.get_event_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                getter.cancel()
+                try:
+                    self._getters.remove(getter)
+                except ValueError:
+                    pass
+                if self._queue and not getter.cancelled():
+                    # woken up but cancelled, pass the chance to the next getter
+                    self._wakeup_next()
+                raise
+        return self._queue.pop()
+
+    def steal(self, num: Optional[int] = None) -> Deque[T]:
+        """steal at most num oldest items, half of the items (rounded up) by default"""
+        if num is not None:
+            _check_split_num(num)
+        queue = self._queue
+        if num is None:
+            num = (len(queue) + 1) // 2
+        popleft = queue.popleft
+        return deque(popleft() for __ in range(min(num, len(queue))))
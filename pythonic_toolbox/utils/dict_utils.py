@@ -2,11 +2,11 @@ import functools
 import numbers
 from bisect import bisect_left
 from collections import UserDict, namedtuple
-from collections.abc import MutableMapping, Mapping
+from collections.abc import ItemsView, MutableMapping, Mapping, ValuesView
 import copy
 from keyword import iskeyword
 from operator import attrgetter
-from typing import (Any, Callable, Dict, Generic, Hashable, Iterator,
+from typing import (Any, Callable, Dict, Generic, Hashable, Iterable, Iterator,
                     List, Optional, Tuple, TypeVar, Union, Sequence,
                     Set)
 
@@ -114,6 +114,90 @@ def unique_list_of_dicts(dict_list: List[Dict]) -> List[Dict]:
     return unique_res
 
 
+def group_list_of_dicts(dict_lst: Iterable[Dict],
+                        by: List[HashableT],
+                        aggs: Optional[Dict[HashableT, Union[Callable[[List[Any]], Any],
+                                                             Tuple[HashableT, Callable[[List[Any]], Any]]]]] = None,
+                        val_for_missing_key=None) -> List[Dict]:
+    """
+    Group the dict collections by keys in a single pass (hash aggregate), groups are kept in first-seen order.
+    aggs maps output key to an aggregate function, which is applied to the values of the same key in each group,
+    or to a pair (source key, aggregate function); rows missing the source key are not counted in,
+    and val_for_missing_key is used instead of calling the aggregate function if all rows of a group miss it.
+    """
+    by = list(by)
+    if not by:
+        raise ValueError('by should be a non-empty list of keys')
+
+    agg_specs: List[Tuple[HashableT, HashableT, Callable[[List[Any]], Any]]] = []
+    for out_key, spec in (aggs or {}).items():
+        if isinstance(spec, tuple):
+            src_key, agg_fun = spec
+        else:
+            src_key, agg_fun = out_key, spec
+        if not callable(agg_fun):
+            raise ValueError(f'aggregate function for {repr(out_key)} is not callable')
+        agg_specs.append((out_key, src_key, agg_fun))
+
+    src_keys = list(dict.fromkeys(src_key for _, src_key, _ in agg_specs))
+
+    # group key -> values collected for each source key
+    groups: Dict[Tuple, Dict[HashableT, List[Any]]] = {}
+    for dct in dict_lst:
+        group_key = tuple(dct.get(k, val_for_missing_key) for k in by)
+        collected = groups.get(group_key)
+        if collected is None:
+            collected = groups[group_key] = {src_key: [] for src_key in src_keys}
+        for src_key in src_keys:
+            if src_key in dct:
+                collected[src_key].append(dct[src_key])
+
+    res: List[Dict] = []
+    for group_key, collected in groups.items():
+        row = dict(zip(by, group_key))
+        for out_key, src_key, agg_fun in agg_specs:
+            values = collected[src_key]
+            # e.g. max, min, statistics.mean raise on an empty list
+            row[out_key] = agg_fun(values) if values else val_for_missing_key
+        res.append(row)
+    return res
+
+
+def join_list_of_dicts(left: Iterable[Dict], right: Iterable[Dict],
+                       on: List[HashableT], how: str = 'inner') -> List[Dict]:
+    """
+    Join two dict collections on keys (hash join), right is indexed once and left is streamed,
+    values in right overwrite the ones in left for same keys, rows missing any of the keys never match.
+    """
+    on = list(on)
+    if not on:
+        raise ValueError('on should be a non-empty list of keys')
+    if how not in {'inner', 'left'}:
+        raise ValueError(f'how should be "inner" or "left", but got {repr(how)}')
+
+    UNSIGNED = object()
+
+    def join_key(dct: Dict) -> Optional[Tuple]:
+        key = tuple(dct.get(k, UNSIGNED) for k in on)
+        return None if any(v is UNSIGNED for v in key) else key
+
+    index: Dict[Tuple, List[Dict]] = {}
+    for dct in right:
+        key = join_key(dct)
+        if key is not None:
+            index.setdefault(key, []).append(dct)
+
+    res: List[Dict] = []
+    for dct in left:
+        key = join_key(dct)
+        matched = index.get(key) if key is not None else None
+        if matched:
+            res.extend({**dct, **other} for other in matched)
+        elif how == 'left':
+            res.append(dict(dct))
+    return res
+
+
 def walk_leaves(data: Optional[Union[Dict, List]] = None,
                 trans_fun: Optional[Callable[[Any], Any]] = None,
                 inplace: bool = False) -> Optional[Union[Dict, List]]:
@@ -598,7 +682,37 @@ class StrKeyIdDict(UserDict):
 
     def __init__(self, *args, **kwargs):
         validated_data = self._validate_input(*args, **kwargs)
-        super().__init__(validated_data)
+        super().__init__()
+        # validated data is already a new dict with str keys, no need to copy it again via update
+        self.data = validated_data
+
+    @classmethod
+    def from_items(cls, items: Union[Mapping, Iterable[Tuple[Union[int, str], Any]]],
+                   trusted: bool = False) -> 'StrKeyIdDict':
+        """
+        Bulk constructor, validate and build from a mapping or (key, value) pairs in one pass,
+        if trusted is True, keys are assumed to be already str type and used without validation
+        """
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        inner_key = cls._inner_key
+        if trusted:
+            data = dict(items) if inner_key is str else {inner_key(key): val for key, val in items}
+        else:
+            data = {}
+            for key, val in items:
+                if not cls.is_valid_key(key):
+                    raise TypeError(
+                        f'{repr(key)}: Key for ID must be an integer or a string, but got {type(key)}')
+                key_for_data = inner_key(key)
+                if key_for_data in data:
+                    raise TypeError(f'Duplicated key: {repr(key)} detected')
+                data[key_for_data] = val
+
+        instance = cls()
+        instance.data = data
+        return instance
 
     def _validate_input(self, *args, **kwargs) -> Dict:
         if len(args) > 1:
@@ -614,13 +728,15 @@ class StrKeyIdDict(UserDict):
         raw_data.update(my_dict)
         raw_data.update(kwargs)
 
-        valid_data: Dict[str, Any] = {}
+        inner_key = self._inner_key
+        valid_data: Dict[Union[str, int], Any] = {}
         for key, val in raw_data.items():
             if not self.is_valid_key(key):
                 raise TypeError(
                     f'{repr(key)}: Key for ID must be an integer or a string, but got {type(key)}')
-            if str(key) not in valid_data.keys():
-                valid_data[str(key)] = val
+            key_for_data = inner_key(key)
+            if key_for_data not in valid_data:
+                valid_data[key_for_data] = val
             else:
                 # handle duplicated keys (e.g. '1', 1)
                 duplicate_keys: Set[Union[str, int]] = set()
@@ -632,6 +748,9 @@ class StrKeyIdDict(UserDict):
 
         return valid_data
 
+    # convert an ID key to the key stored inside self.data
+    _inner_key = staticmethod(str)
+
     @classmethod
     def is_valid_key(cls, key):
         return isinstance(key, (int, str))
@@ -652,8 +771,26 @@ class StrKeyIdDict(UserDict):
     def __delitem__(self, key):
         del self.data[str(key)]
 
+    def get_many(self, ids: Iterable[Union[int, str]], default: Optional[Any] = None) -> List[Any]:
+        """batch version of get, keys are converted once per batch, without the __missing__ fallback"""
+        get = self.data.get
+        return [get(key, default) for key in map(self._inner_key, ids)]
+
+    def contains_many(self, ids: Iterable[Union[int, str]]) -> List[bool]:
+        data = self.data
+        return [key in data for key in map(self._inner_key, ids)]
+
+    def set_many(self, pairs: Union[Mapping, Iterable[Tuple[Union[int, str], Any]]]) -> None:
+        if isinstance(pairs, Mapping):
+            pairs = pairs.items()
+        data, inner_key, is_valid_key = self.data, self._inner_key, self.is_valid_key
+        for key, val in pairs:
+            if not is_valid_key(key):
+                raise TypeError(f'Key must be a string or integer, but got {repr(key)}')
+            data[inner_key(key)] = val
+
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, StrKeyIdDict):
+        if isinstance(other, StrKeyIdDict) and type(other)._inner_key is type(self)._inner_key:
             return self.data == other.data
         if isinstance(other, Mapping) and len(other) == len(self):
             for key, val in self.items():
@@ -672,3 +809,68 @@ class StrKeyIdDict(UserDict):
         for key in iterable:
             d[key] = value
         return d
+
+
+class IntKeyIdDict(StrKeyIdDict):
+    """
+    Same as StrKeyIdDict, ID keys are still equivalent in int/str form (1 == '1'), and are presented as strings,
+    but the ones in canonical decimal form (1, '1', -1, but not '01') are stored as int inside,
+    to save the int-to-str conversion and string hashing on every access for int-heavy workloads.
+    Keys are converted to string only at the boundary: iteration, keys/items, repr etc.
+    """
+
+    @staticmethod
+    def _inner_key(key):
+        if type(key) is int:
+            return key
+        if type(key) is not str:
+            key = str(key)
+        if key[-1:].isdigit():
+            # cheap check before trying int conversion, e.g. uuid-like keys are skipped mostly
+            try:
+                int_key = int(key)
+            except ValueError:
+                return key
+            if str(int_key) == key:
+                return int_key
+        return key
+
+    def __getitem__(self, key):
+        try:
+            return self.data[self._inner_key(key)]
+        except KeyError:
+            raise KeyError(f'KeyError: {repr(key)}') from None
+
+    def __contains__(self, key):
+        return self._inner_key(key) in self.data
+
+    def __setitem__(self, key, value):
+        if not self.is_valid_key(key):
+            raise TypeError(f'Key must be a string or integer, but got {repr(key)}')
+        self.data[self._inner_key(key)] = value
+
+    def __delitem__(self, key):
+        del self.data[self._inner_key(key)]
+
+    def __iter__(self):
+        return map(str, self.data)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def items(self):
+        return _IntKeyIdItemsView(self)
+
+    def values(self):
+        return _IntKeyIdValuesView(self)
+
+
+class _IntKeyIdItemsView(ItemsView):
+    def __iter__(self):
+        for key, val in self._mapping.data.items():
+            yield str(key), val
+
+
+class _IntKeyIdValuesView(ValuesView):
+    def __iter__(self):
+        return iter(self._mapping.data.values())
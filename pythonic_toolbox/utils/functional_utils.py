@@ -1,5 +1,13 @@
+import asyncio
+import inspect
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from functools import reduce
-from typing import List, Callable, TypeVar, Iterator, Sequence, Union
+from itertools import chain, islice
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Deque, Dict, Generic, Iterable, List, Callable,
+                    Optional, Set, Tuple, TypeVar, Iterator, Sequence, Union)
 
 T = TypeVar("T")
 
@@ -10,3 +18,220 @@ def filter_multi(functions: Sequence[Callable[[T], bool]], items: Union[Sequence
 
 def lfilter_multi(functions: Sequence[Callable[[T], bool]], items: Union[Sequence[T], Iterator[T]]) -> List[T]:
     return list(filter_multi(functions, items))
+
+
+def pfilter_multi(functions: Sequence[Callable[[T], bool]], items: Union[Sequence[T], Iterator[T]],
+                  workers: Optional[int] = None, chunksize: int = 10000,
+                  use_threads: bool = False, executor: Optional[Executor] = None) -> List[T]:
+    """
+    Parallel lfilter_multi, items are split into chunks, and filtered in a process pool
+    (or a thread pool if use_threads is True, or the given executor), the result keeps the order of items.
+    At most about 2 chunks per worker are pending, so items can be a large iterator.
+    For process pool, functions and items must be picklable, e.g. module level functions
+    """
+    if not isinstance(chunksize, int) or chunksize <= 0:
+        raise ValueError('chunksize should be positive integer')
+
+    functions = list(functions)
+    items_iter = iter(items)
+    chunks = iter(lambda: list(islice(items_iter, chunksize)), [])
+
+    def filter_chunks(pool: Executor) -> List[T]:
+        # chunks are submitted in a bounded window instead of by Executor.map, which consumes all items up front
+        window = 2 * (workers or getattr(pool, '_max_workers', None) or os.cpu_count() or 1)
+        res: List[T] = []
+        pending: Deque[Any] = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(lfilter_multi, functions, chunk))
+                if len(pending) >= window:
+                    res.extend(pending.popleft().result())
+            while pending:
+                res.extend(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+        return res
+
+    if executor is not None:
+        return filter_chunks(executor)
+
+    executor_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_cls(max_workers=workers) as pool:
+        return filter_chunks(pool)
+
+
+def _to_async_iterator(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    if hasattr(items, '__aiter__'):
+        return items.__aiter__()
+
+    async def async_iterator() -> AsyncIterator[T]:
+        for item in items:
+            yield item
+
+    return async_iterator()
+
+
+async def _aclose(iterator: AsyncIterator[Any]) -> None:
+    # async generators left suspended are finalized by the event loop later, or reported as destroyed tasks
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
+
+
+async def afilter_multi(functions: Sequence[Callable[[T], Union[bool, Awaitable[bool]]]],
+                        items: Union[Iterable[T], AsyncIterable[T]],
+                        concurrency: int = 1, ordered: bool = True) -> AsyncIterator[T]:
+    """
+    Async version of filter_multi, functions can be a mix of sync and async predicates, and items can be
+    an iterable or an async iterable. Up to "concurrency" items are checked concurrently,
+    matched items are yielded in the order of items, or as soon as checked if ordered is False.
+    The async iterator of items is closed (if it has aclose) once done, e.g. the consumer stops early
+    """
+    if not isinstance(concurrency, int) or concurrency <= 0:
+        raise ValueError('concurrency should be positive integer')
+
+    functions = list(functions)
+
+    async def check(item: T) -> Tuple[T, bool]:
+        for function in functions:
+            res = function(item)
+            if inspect.isawaitable(res):
+                res = await res
+            if not res:
+                return item, False
+        return item, True
+
+    source = _to_async_iterator(items)
+    ordered_pending: Deque[asyncio.Future] = deque()
+    unordered_pending: Set[asyncio.Future] = set()
+    try:
+        async for item in source:
+            future = asyncio.ensure_future(check(item))
+            if ordered:
+                ordered_pending.append(future)
+                if len(ordered_pending) >= concurrency:
+                    item, passed = await ordered_pending.popleft()
+                    if passed:
+                        yield item
+            else:
+                unordered_pending.add(future)
+                if len(unordered_pending) >= concurrency:
+                    done, unordered_pending = await asyncio.wait(unordered_pending,
+                                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for item, passed in map(asyncio.Future.result, done):
+                        if passed:
+                            yield item
+
+        while ordered_pending:
+            item, passed = await ordered_pending.popleft()
+            if passed:
+                yield item
+
+        while unordered_pending:
+            done, unordered_pending = await asyncio.wait(unordered_pending, return_when=asyncio.FIRST_COMPLETED)
+            for item, passed in map(asyncio.Future.result, done):
+                if passed:
+                    yield item
+    finally:
+        # e.g. the consumer stops iterating early
+        for future in chain(ordered_pending, unordered_pending):
+            future.cancel()
+        await _aclose(source)
+
+
+class _PredicateStats:
+    __slots__ = ('function', 'calls', 'passes', 'total_time')
+
+    def __init__(self, function: Callable[[Any], bool]):
+        self.function = function
+        self.calls = 0
+        self.passes = 0
+        self.total_time = 0.0
+
+    @property
+    def rank(self) -> float:
+        """expected cost to reject an item, predicates in ascending rank minimize the total cost"""
+        if self.calls == 0:
+            # never evaluated yet, try it early to get its statistics
+            return 0.0
+        reject_rate = 1 - self.passes / self.calls
+        if reject_rate == 0:
+            return float('inf')
+        return (self.total_time / self.calls) / reject_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': getattr(self.function, '__name__', repr(self.function)),
+            'calls': self.calls,
+            'passes': self.passes,
+            'pass_rate': self.passes / self.calls if self.calls else None,
+            'total_time': self.total_time,
+        }
+
+
+class MultiFilter(Generic[T]):
+    """
+    Compiled filter_multi, an item is checked by predicates one by one in a single loop, and short-circuited on
+    the first failed predicate. If adaptive is True, predicates are reordered every reorder_interval items by
+    observed pass rate and time cost, which requires predicates to be side-effect free.
+    Per-predicate statistics are collected if collect_stats/adaptive is True, which is not thread-safe.
+    """
+
+    def __init__(self, functions: Sequence[Callable[[T], bool]],
+                 adaptive: bool = False, collect_stats: bool = False, reorder_interval: int = 1000):
+        if not isinstance(reorder_interval, int) or reorder_interval <= 0:
+            raise ValueError('reorder_interval should be positive integer')
+        self.functions: List[Callable[[T], bool]] = list(functions)
+        self.adaptive = adaptive
+        self.collect_stats = collect_stats or adaptive
+        self.reorder_interval = reorder_interval
+        self._stats = [_PredicateStats(f) for f in self.functions]
+        self._checked_num = 0
+
+    def __call__(self, item: T) -> bool:
+        if not self.collect_stats:
+            for function in self.functions:
+                if not function(item):
+                    return False
+            return True
+
+        perf_counter = time.perf_counter
+        res = True
+        for stats in self._stats:
+            start = perf_counter()
+            passed = stats.function(item)
+            stats.total_time += perf_counter() - start
+            stats.calls += 1
+            if not passed:
+                res = False
+                break
+            stats.passes += 1
+
+        if self.adaptive:
+            self._checked_num += 1
+            if self._checked_num % self.reorder_interval == 0:
+                self.reorder()
+        return res
+
+    def reorder(self) -> None:
+        self._stats.sort(key=lambda s: s.rank)
+        self.functions = [stats.function for stats in self._stats]
+
+    @property
+    def stats(self) -> List[Dict[str, Any]]:
+        """statistics of predicates, in current evaluating order"""
+        return [stats.to_dict() for stats in self._stats]
+
+    def reset_stats(self) -> None:
+        self._stats = [_PredicateStats(f) for f in self.functions]
+        self._checked_num = 0
+
+    def filter(self, items: Union[Sequence[T], Iterator[T]]) -> Iterator[T]:
+        if not self.collect_stats:
+            # chained builtin filters run in C, fastest when no statistics needed
+            return iter(filter_multi(self.functions, items))
+        return filter(self, items)
+
+    def lfilter(self, items: Union[Sequence[T], Iterator[T]]) -> List[T]:
+        return list(self.filter(items))
@@ -1,26 +1,232 @@
+import asyncio
+import heapq
+import inspect
 import json
-from collections import defaultdict
+import pickle
+import sys
+import tempfile
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Sequence as SequenceABC
+from concurrent.futures import ThreadPoolExecutor
 from functools import singledispatch
-from typing import (List, Iterable, Generator, Union, Optional, Callable,
-                    TypeVar, Any, Tuple, DefaultDict, Hashable, overload)
+from itertools import chain, filterfalse, islice, repeat
+from typing import (List, Iterable, Iterator, Generator, Union, Optional, Callable, IO, Sequence,
+                    AsyncIterable, AsyncIterator, Awaitable, TypeVar, Any, Tuple, Type, DefaultDict, Deque, Dict,
+                    FrozenSet, Generic, Hashable, Set, overload)
 
 from funcy import first, identity
 
+from pythonic_toolbox.utils.functional_utils import _aclose, _to_async_iterator, afilter_multi
+
 T = TypeVar("T")
 T1 = TypeVar("T1")
 
 
+def _default_hash_fun_for(sample: Any) -> Callable:
+    try:
+        # judge if value type is hashable on runtime
+        {sample: None}
+    except TypeError:
+        return json.dumps
+    return identity
+
+
+class CustomOrder(Generic[T]):
+    """
+    Pre-built custom orders, which can be reused to sort values across calls:
+    values in prefix_orders come first, values in suffix_orders come last, both in the given order,
+    the rest are sorted in between; key of each value is evaluated only once per sort
+    """
+
+    def __init__(self,
+                 prefix_orders: Optional[List[T]] = None,
+                 suffix_orders: Optional[List[T]] = None,
+                 key: Optional[Callable[[T], Any]] = None,
+                 hash_fun: Optional[Callable] = None):
+        if prefix_orders is None:
+            prefix_orders = []
+
+        if suffix_orders is None:
+            suffix_orders = []
+
+        if not isinstance(prefix_orders, list):
+            raise ValueError('prefix_orders should be a list if provided')
+
+        if not isinstance(suffix_orders, list):
+            raise ValueError('suffix_orders should be a list if provided')
+
+        if key is None:
+            key = identity
+
+        value_hash_fun = key_hash_fun = hash_fun
+        if hash_fun is None and (prefix_orders or suffix_orders):
+            # values (e.g. dicts) may be unhashable while their key values are hashable,
+            # only fall back to json.dumps for the ones that are really unhashable
+            sample = first(prefix_orders or suffix_orders)
+            value_hash_fun = _default_hash_fun_for(sample)
+            key_hash_fun = _default_hash_fun_for(key(sample))
+
+        prefix_orders_set = set(map(value_hash_fun, prefix_orders))
+        if len(prefix_orders) != len(prefix_orders_set):
+            raise ValueError('prefix_orders contains duplicated values')
+
+        suffix_orders_set = set(map(value_hash_fun, suffix_orders))
+        if len(suffix_orders) != len(suffix_orders_set):
+            raise ValueError('suffix_orders contains duplicated values')
+
+        if prefix_orders_set.intersection(suffix_orders_set):
+            raise ValueError('prefix and suffix contains same value')
+
+        # values not in prefix_orders/suffix_orders are in order 1
+        order_map: Dict[Hashable, int] = {}
+        for idx, item in enumerate(prefix_orders):
+            order_map[key_hash_fun(key(item))] = idx - len(prefix_orders)
+
+        for idx, item in enumerate(suffix_orders, start=2):
+            order_map[key_hash_fun(key(item))] = idx
+
+        self._key = key
+        self._hash_fun = key_hash_fun
+        self._order_map = order_map
+
+    def sort_key(self, value: T) -> Tuple[int, Any]:
+        key_value = self._key(value)
+        if not self._order_map:
+            return 1, key_value
+        return self._order_map.get(self._hash_fun(key_value), 1), key_value
+
+    def sort(self, values: List[T], reverse: bool = False, limit: Optional[int] = None) -> List[T]:
+        """
+        :param limit: only return the first "limit" sorted values, picked by heap instead of a full sort
+        """
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            raise ValueError('limit should be non-negative integer or None')
+
+        key, hash_fun = self._key, self._hash_fun
+        select_top = heapq.nlargest if reverse else heapq.nsmallest
+
+        if not self._order_map:
+            if limit is not None:
+                return select_top(limit, values, key=None if key is identity else key)
+            return sorted(values, key=None if key is identity else key, reverse=reverse)
+
+        if not isinstance(values, list):
+            values = list(values)
+
+        # decorate-sort-undecorate, instead of comparing (order, key value) tuples,
+        # bucket indices by order, then sort indices by key value within each bucket, which keeps the sort stable
+        key_values = values if key is identity else list(map(key, values))
+        hashes = key_values if hash_fun is identity else map(hash_fun, key_values)
+        buckets: DefaultDict[int, List[int]] = defaultdict(list)
+        for idx, order in enumerate(map(self._order_map.get, hashes, repeat(1))):
+            buckets[order].append(idx)
+
+        rest_num = len(values) if limit is None else min(limit, len(values))
+        res: List[T] = []
+        for order in sorted(buckets, reverse=reverse):
+            if rest_num <= 0:
+                break
+            bucket = buckets[order]
+            if len(bucket) <= rest_num:
+                sorted_indices = sorted(bucket, key=key_values.__getitem__, reverse=reverse)
+            else:
+                # same as sorted(...)[:rest_num], stable as well
+                sorted_indices = select_top(rest_num, bucket, key=key_values.__getitem__)
+            res.extend([values[idx] for idx in sorted_indices])
+            rest_num -= len(sorted_indices)
+        return res
+
+    def external_sort(self, values: Iterable[T], reverse: bool = False,
+                      chunk_size: int = 100000, tmp_dir: Optional[str] = None) -> Iterator[T]:
+        """
+        External merge sort for large inputs which cannot fit in memory:
+        values are sorted in chunks, sorted chunks are spilled to temporary files by pickle,
+        and then k-way merged lazily, values must be picklable
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError('chunk_size should be positive integer')
+        return self._external_sort(iter(values), reverse, chunk_size, tmp_dir)
+
+    def _external_sort(self, values_iter: Iterator[T], reverse: bool,
+                       chunk_size: int, tmp_dir: Optional[str]) -> Iterator[T]:
+        # levels[i] holds runs merged i times, runs are merged as soon as _MAX_MERGE_RUNS of them are at a level,
+        # so that at most about _MAX_MERGE_RUNS * len(levels) files are opened at the same time.
+        # Runs of a higher level always hold earlier values, merging adjacent runs keeps the sort stable
+        levels: List[List[IO[bytes]]] = []
+
+        def merge(runs: List[IO[bytes]]) -> Iterator[T]:
+            return heapq.merge(*map(_load_run, runs), key=self.sort_key, reverse=reverse)
+
+        def add_run(run: IO[bytes], level: int = 0) -> None:
+            while True:
+                if level == len(levels):
+                    levels.append([])
+                levels[level].append(run)
+                if len(levels[level]) < _MAX_MERGE_RUNS:
+                    return
+                group = levels[level]
+                levels[level] = []
+                try:
+                    run = _spill_run(merge(group), tmp_dir)
+                finally:
+                    for merged_run in group:
+                        merged_run.close()
+                level += 1
+
+        try:
+            chunk = list(islice(values_iter, chunk_size))
+            while chunk:
+                sorted_chunk = self.sort(chunk, reverse=reverse)
+                chunk = list(islice(values_iter, chunk_size))
+                if not levels and not chunk:
+                    # all values fit in one chunk, no need to spill
+                    yield from sorted_chunk
+                    return
+                add_run(_spill_run(sorted_chunk, tmp_dir))
+
+            yield from merge([run for runs in reversed(levels) for run in runs])
+        finally:
+            for runs in levels:
+                for run in runs:
+                    run.close()
+
+
+_MAX_MERGE_RUNS = 128
+_SPILL_BATCH_SIZE = 1000
+
+
+def _spill_run(sorted_values: Iterable[Any], tmp_dir: Optional[str] = None) -> IO[bytes]:
+    run = tempfile.TemporaryFile(dir=tmp_dir)
+    try:
+        sorted_values = iter(sorted_values)
+        batch = list(islice(sorted_values, _SPILL_BATCH_SIZE))
+        while batch:
+            pickle.dump(batch, run, protocol=pickle.HIGHEST_PROTOCOL)
+            batch = list(islice(sorted_values, _SPILL_BATCH_SIZE))
+        run.seek(0)
+    except BaseException:
+        run.close()
+        raise
+    return run
+
+
+def _load_run(run: IO[bytes]) -> Iterator[Any]:
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
+
+
 def sort_with_custom_orders(values: List[T],
                             prefix_orders: Optional[List[T]] = None,
                             suffix_orders: Optional[List[T]] = None,
                             key: Optional[Callable[[T], Any]] = None,
                             hash_fun: Optional[Callable] = None,
-                            reverse: bool = False) -> List[T]:
-    class Empty:
-        pass
-
-    UNSIGNED = Empty()
-
+                            reverse: bool = False,
+                            limit: Optional[int] = None) -> List[T]:
     if prefix_orders is None:
         prefix_orders = []
 
@@ -33,80 +239,42 @@ def sort_with_custom_orders(values: List[T],
     if not isinstance(suffix_orders, list):
         raise ValueError('suffix_orders should be a list if provided')
 
-    default_hash_fun = json.dumps
-
-    if key is None:
-        key = identity
-
-    value_types = set(map(type, values))
-    value_types.update(set(map(type, prefix_orders)))
-    value_types.update(set(map(type, suffix_orders)))
+    value_types = set(map(type, chain(values, prefix_orders, suffix_orders)))
     if len(value_types) > 1:
         raise ValueError('multi types provided in values, prefix_orders, suffix_orders')
 
-    samples = filter(lambda x: x is not UNSIGNED, [first(values)] + [first(prefix_orders)] + [first(suffix_orders)])
-    sample = first(samples)
-
-    if sample is UNSIGNED:
+    if not value_types:
         # nothing provided in values, prefix_orders, suffix_orders
         return []
 
-    is_value_type_hashable = True
-    try:
-        # judge if value type is hashable on runtime
-        {sample: None}
-    except TypeError:
-        is_value_type_hashable = False
-
-    if is_value_type_hashable:
-        _hash_fun = hash_fun or identity
-    else:
-        if hash_fun is not None:
-            _hash_fun = hash_fun
-        else:
-            _hash_fun = default_hash_fun
-    hash_fun = _hash_fun
-
-    prefix_orders = list(prefix_orders)
-    prefix_orders_set = set(map(hash_fun, prefix_orders))
-
-    if len(prefix_orders) != len(prefix_orders_set):
-        raise ValueError('prefix_orders contains duplicated values')
-
-    suffix_orders = list(suffix_orders)
-    suffix_orders_set = set(map(hash_fun, suffix_orders))
-
-    if len(suffix_orders) != len(suffix_orders_set):
-        raise ValueError('suffix_orders contains duplicated values')
+    custom_order = CustomOrder(prefix_orders, suffix_orders, key=key, hash_fun=hash_fun)
+    return custom_order.sort(values, reverse=reverse, limit=limit)
 
-    if prefix_orders_set.intersection(suffix_orders_set):
-        raise ValueError('prefix and suffix contains same value')
 
-    order_map: DefaultDict[Hashable, int] = defaultdict(lambda: 1)
-    for idx, item in enumerate(prefix_orders):
-        order_map[_hash_fun(key(item))] = idx - len(prefix_orders)
+def external_sort_with_custom_orders(values: Iterable[T],
+                                     prefix_orders: Optional[List[T]] = None,
+                                     suffix_orders: Optional[List[T]] = None,
+                                     key: Optional[Callable[[T], Any]] = None,
+                                     hash_fun: Optional[Callable] = None,
+                                     reverse: bool = False,
+                                     chunk_size: int = 100000,
+                                     tmp_dir: Optional[str] = None) -> Iterator[T]:
+    """
+    Streaming version of sort_with_custom_orders, accept an iterator and return a lazy iterator,
+    sorted chunks are spilled to temporary files (under tmp_dir), so the memory usage is bounded by chunk_size
+    """
+    custom_order = CustomOrder(prefix_orders, suffix_orders, key=key, hash_fun=hash_fun)
+    return custom_order.external_sort(values, reverse=reverse, chunk_size=chunk_size, tmp_dir=tmp_dir)
 
-    for idx, item in enumerate(suffix_orders, start=2):
-        order_map[_hash_fun(key(item))] = idx
 
-    def key_func(x: T) -> Tuple[int, Any]:
-        return order_map[hash_fun(key(x))], key(x)
+class _Unsigned:
+    pass
 
-    sorted_values = sorted(values, key=key_func, reverse=reverse)
 
-    return sorted_values
+_UNSIGNED = _Unsigned()
 
 
-def until(values: Optional[Union[List[T], Iterable]],
-          terminate: Optional[Callable[[T], bool]] = None,
-          default: Optional[T] = None,
-          max_iter_num: Optional[int] = None,
-          ) -> Optional[T]:
-    class Empty:
-        pass
-
-    UNSIGNED = Empty()
-
+def _check_max_iter_num(max_iter_num: Optional[int]) -> None:
     if isinstance(max_iter_num, int):
         if max_iter_num <= 0:
             raise ValueError('max_iter_num should be positive integer')
@@ -116,28 +284,224 @@ def until(values: Optional[Union[List[T], Iterable]],
     else:
         raise ValueError('max_iter_num should be positive integer or None')
 
-    def default_terminate(v: Any) -> bool:
-        return v is not UNSIGNED
+
+def _default_terminate(v: Any) -> bool:
+    return v is not _UNSIGNED
+
+
+def until(values: Optional[Union[List[T], Iterable]],
+          terminate: Optional[Callable[[T], bool]] = None,
+          default: Optional[T] = None,
+          max_iter_num: Optional[int] = None,
+          ) -> Optional[T]:
+    _check_max_iter_num(max_iter_num)
 
     if values is None:
         return default
 
     if terminate is None:
-        terminate = default_terminate
+        terminate = _default_terminate
 
     if isinstance(values, (list, Iterable)):
-        for idx, value in enumerate(values, start=1):
-            if max_iter_num is not None and idx > max_iter_num:
-                break
+        if max_iter_num is not None:
+            values = islice(values, max_iter_num)
+        for value in values:
             if terminate(value):
                 return value
-        else:
-            pass
         return default
     else:
         raise ValueError('values type should be list, Iterable')
 
 
+def until_batched(values: Optional[Union[Sequence[T], Iterable]],
+                  terminate_batch: Callable[[Sequence[T]], Optional[int]],
+                  batch_size: int = 1000,
+                  default: Optional[T] = None,
+                  max_iter_num: Optional[int] = None,
+                  ) -> Optional[T]:
+    """
+    Batched version of until, terminate_batch gets a batch of values, and returns index of the first value
+    satisfying the condition in the batch, or None if not found, e.g. a vectorized check.
+    Batches of a list, tuple, range or numpy array are slices of it, otherwise lists
+    """
+    _check_max_iter_num(max_iter_num)
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError('batch_size should be positive integer')
+
+    if values is None:
+        return default
+
+    np = sys.modules.get('numpy')
+    # only slice types known to support it, slicing is not required by Sequence, e.g. deque
+    if isinstance(values, (list, tuple, range)) or (np is not None and isinstance(values, np.ndarray)):
+        total = len(values) if max_iter_num is None else min(len(values), max_iter_num)
+        batches = (values[i:min(i + batch_size, total)] for i in range(0, total, batch_size))
+    elif isinstance(values, Iterable):
+        values_iter = iter(values) if max_iter_num is None else islice(values, max_iter_num)
+        batches = iter(lambda: list(islice(values_iter, batch_size)), [])
+    else:
+        raise ValueError('values type should be list, Iterable')
+
+    for batch in batches:
+        idx = terminate_batch(batch)
+        if idx is not None:
+            return batch[idx]
+    return default
+
+
+async def auntil(values: Optional[Union[Iterable[T], AsyncIterable[T]]],
+                 terminate: Optional[Callable[[T], Union[bool, Awaitable[bool]]]] = None,
+                 default: Optional[T] = None,
+                 max_iter_num: Optional[int] = None,
+                 concurrency: int = 1,
+                 ) -> Optional[T]:
+    """
+    Async version of until, values can be an iterable or an async iterable, terminate can be sync or async.
+    Up to "concurrency" values are checked concurrently ahead, the first value in order satisfying
+    the condition is returned, and the checks still running are cancelled
+    """
+    _check_max_iter_num(max_iter_num)
+
+    if values is None:
+        return default
+
+    if terminate is None:
+        terminate = _default_terminate
+
+    async def limited_values() -> AsyncIterator[T]:
+        num = 0
+        source = _to_async_iterator(values)
+        try:
+            async for value in source:
+                if max_iter_num is not None and num >= max_iter_num:
+                    break
+                num += 1
+                yield value
+        finally:
+            await _aclose(source)
+
+    matched_values = afilter_multi([terminate], limited_values(), concurrency=concurrency)
+    try:
+        async for value in matched_values:
+            return value
+    finally:
+        await matched_values.aclose()
+    return default
+
+
+def first_success(candidates: Optional[Iterable[T]],
+                  fn: Callable[[T], T1],
+                  max_parallel: int = 1,
+                  terminate: Optional[Callable[[T1], bool]] = None,
+                  default: Optional[T1] = None,
+                  max_iter_num: Optional[int] = None,
+                  exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+                  ) -> Optional[T1]:
+    """
+    Call fn on candidates in priority order, and return the result of the first candidate that succeeds,
+    i.e. fn doesn't raise one of exceptions and terminate(result) is True (any result by default).
+    Up to max_parallel candidates are tried concurrently in threads, and a later candidate's result is used
+    only if all earlier ones failed; calls not started yet are cancelled, running ones are left to finish
+    in background
+    """
+    _check_max_iter_num(max_iter_num)
+    if not isinstance(max_parallel, int) or max_parallel <= 0:
+        raise ValueError('max_parallel should be positive integer')
+
+    if candidates is None:
+        return default
+
+    if terminate is None:
+        terminate = _default_terminate
+
+    candidates_iter = iter(candidates) if max_iter_num is None else islice(candidates, max_iter_num)
+
+    def attempt(candidate: T) -> Tuple[bool, Optional[T1]]:
+        try:
+            res = fn(candidate)
+        except exceptions:
+            return False, None
+        return bool(terminate(res)), res
+
+    if max_parallel == 1:
+        for candidate in candidates_iter:
+            succeeded, res = attempt(candidate)
+            if succeeded:
+                return res
+        return default
+
+    pool = ThreadPoolExecutor(max_workers=max_parallel)
+    futures = deque(pool.submit(attempt, candidate) for candidate in islice(candidates_iter, max_parallel))
+    try:
+        while futures:
+            succeeded, res = futures.popleft().result()
+            if succeeded:
+                return res
+            for candidate in islice(candidates_iter, 1):
+                futures.append(pool.submit(attempt, candidate))
+        return default
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+async def afirst_success(candidates: Optional[Union[Iterable[T], AsyncIterable[T]]],
+                         fn: Callable[[T], Union[T1, Awaitable[T1]]],
+                         max_parallel: int = 1,
+                         terminate: Optional[Callable[[T1], bool]] = None,
+                         default: Optional[T1] = None,
+                         max_iter_num: Optional[int] = None,
+                         exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+                         ) -> Optional[T1]:
+    """
+    Async version of first_success, candidates can be an async iterable and fn can be async,
+    up to max_parallel candidates are tried concurrently as tasks, the rest are cancelled once decided
+    """
+    _check_max_iter_num(max_iter_num)
+    if not isinstance(max_parallel, int) or max_parallel <= 0:
+        raise ValueError('max_parallel should be positive integer')
+
+    if candidates is None:
+        return default
+
+    if terminate is None:
+        terminate = _default_terminate
+
+    async def attempt(candidate: T) -> Tuple[bool, Optional[T1]]:
+        try:
+            res = fn(candidate)
+            if inspect.isawaitable(res):
+                res = await res
+        except exceptions:
+            return False, None
+        return bool(terminate(res)), res
+
+    futures: Deque[asyncio.Future] = deque()
+    candidates_iter = _to_async_iterator(candidates)
+    try:
+        num = 0
+        async for candidate in candidates_iter:
+            if max_iter_num is not None and num >= max_iter_num:
+                break
+            num += 1
+            futures.append(asyncio.ensure_future(attempt(candidate)))
+            if len(futures) >= max_parallel:
+                succeeded, res = await futures.popleft()
+                if succeeded:
+                    return res
+
+        while futures:
+            succeeded, res = await futures.popleft()
+            if succeeded:
+                return res
+        return default
+    finally:
+        for future in futures:
+            future.cancel()
+        await _aclose(candidates_iter)
+
+
 @overload
 def unpack_list(source: List[Any], target_num: int, default: Optional[Any] = None) -> List[Any]:
     pass
@@ -150,21 +514,15 @@ def unpack_list(source: Union[Generator, Iterable, range], target_num: int, defa
 
 @singledispatch
 def unpack_list(source: Union[Generator, Iterable, range], target_num: int, default: Optional[Any] = None) -> List[Any]:
-    source_iter = iter(source)
-    res = []
-    cnt = 0
-    try:
-        while cnt < target_num:
-            tmp = next(source_iter)
-            res.append(tmp)
-            cnt += 1
-    except StopIteration:
-        pass
-
-    while cnt < target_num:
-        res.append(default)
-        cnt += 1
-
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(source, np.ndarray):
+        # slicing a numpy array is a view, elements are kept as numpy scalars/rows like iterating it
+        res = list(source[:target_num]) if target_num > 0 else []
+    else:
+        # islice pulls exactly target_num items at most, the rest of a generator are kept
+        res = list(islice(source, target_num)) if target_num > 0 else []
+    if len(res) < target_num:
+        res += [default] * (target_num - len(res))
     return res
 
 
@@ -173,28 +531,137 @@ def _(source: List[Any], target_num: int, default: Optional[Any] = None) -> List
     return [*source, *([default] * (target_num - len(source)))] if len(source) < target_num else source[:target_num]
 
 
+@unpack_list.register(SequenceABC)
+def _(source: Sequence[Any], target_num: int, default: Optional[Any] = None) -> List[Any]:
+    if target_num <= 0:
+        return []
+    try:
+        res = list(source[:target_num])
+    except TypeError:
+        # slicing is not required by Sequence, e.g. deque
+        res = list(islice(source, target_num))
+    if len(res) < target_num:
+        res += [default] * (target_num - len(res))
+    return res
+
+
+@unpack_list.register(memoryview)
+@unpack_list.register(array)
+def _(source: Union[memoryview, array], target_num: int, default: Optional[Any] = None) -> List[Any]:
+    # slicing a memoryview is zero-copy, and tolist converts elements in C
+    res = source[:target_num].tolist() if target_num > 0 else []
+    if len(res) < target_num:
+        res += [default] * (target_num - len(res))
+    return res
+
+
+class AllowBlockFilter(Generic[T, T1]):
+    """
+    Reusable filter in the same semantics of filter_allowable, allow_list/block_list are converted to sets only once,
+    instance is picklable (if key is picklable) to be shared across processes, and can be used as a predicate
+    """
+
+    def __init__(self,
+                 allow_list: Optional[Iterable[T1]] = None,
+                 block_list: Optional[Iterable[T1]] = None,
+                 key: Optional[Callable[[T], T1]] = None):
+        self.allow_set: FrozenSet[T1] = frozenset(_to_set(allow_list))
+        self.block_set: FrozenSet[T1] = frozenset(_to_set(block_list))
+        self.key = key
+        # allowable ones must be in allow_list and not in block_list, check them in one set
+        self._allowed_set: Optional[FrozenSet[T1]] = None
+        if self.allow_set:
+            self._allowed_set = self.allow_set - self.block_set if self.block_set else self.allow_set
+
+    def __reduce__(self):
+        # _allowed_set is derived, no need to pickle it
+        return self.__class__, (self.allow_set, self.block_set, self.key)
+
+    def __call__(self, candidate: T) -> bool:
+        value = candidate if self.key is None else self.key(candidate)
+        if self._allowed_set is not None:
+            return value in self._allowed_set
+        return value not in self.block_set
+
+    def filter(self, candidates: Optional[Iterable[T]] = None) -> Iterator[T]:
+        candidates_iter = iter(candidates if candidates is not None else [])
+        if self.key is not None:
+            return filter(self, candidates_iter)
+        # membership checks in C without calling back into python
+        if self._allowed_set is not None:
+            return filter(self._allowed_set.__contains__, candidates_iter)
+        if self.block_set:
+            return filterfalse(self.block_set.__contains__, candidates_iter)
+        return candidates_iter
+
+
 def filter_allowable(candidates: Optional[List[T]] = None,
                      allow_list: Optional[List[T1]] = None,
                      block_list: Optional[List[T1]] = None,
                      key: Optional[Callable[..., T1]] = None) -> Iterable[T]:
-    if key is None:
-        key = identity
-    allow_list = allow_list or set()
-    block_list = block_list or set()
-
-    allow_list = set(allow_list)
-    block_list = set(block_list)
-
     if candidates is None:
         candidates = []
 
     candidates = list(candidates)
-    candidates = iter(candidates)
+    return AllowBlockFilter(allow_list, block_list, key=key).filter(candidates)
+
+
+def _to_set(values: Optional[Iterable[T]]) -> Union[Set[T], FrozenSet[T]]:
+    # check None instead of the truth value, which is ambiguous for numpy arrays
+    if values is None:
+        return set()
+    if isinstance(values, (set, frozenset)):
+        return values
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(values, np.ndarray):
+        # python scalars are faster to hash than numpy ones
+        return set(values.tolist())
+    return set(values)
 
-    if block_list:
-        candidates = filter(lambda x: key(x) not in block_list, candidates)
 
-    if allow_list:
-        candidates = filter(lambda x: key(x) in allow_list, candidates)
+def _to_array(np: Any, values: Optional[Iterable[T]]) -> Any:
+    if values is None:
+        return np.asarray([])
+    return values if isinstance(values, np.ndarray) else np.asarray(list(values))
+
+
+def filter_allowable_batch(candidates: Optional[Sequence[T]] = None,
+                           allow_list: Optional[Iterable[T]] = None,
+                           block_list: Optional[Iterable[T]] = None,
+                           return_mask: bool = False) -> Union[List[T], List[bool], Any]:
+    """
+    Batch version of filter_allowable for primitive keys (no key function),
+    allow_list/block_list are merged into one set before checking the candidates,
+    or numpy.isin is used if candidates is a numpy array (numpy is not required otherwise),
+    return the allowable candidates, or the boolean mask of them if return_mask is True
+    """
+    if candidates is None:
+        candidates = []
 
-    return candidates
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(candidates, np.ndarray):
+        allow_arr = _to_array(np, allow_list)
+        block_arr = _to_array(np, block_list)
+        mask = np.ones(candidates.shape, dtype=bool)
+        if allow_arr.size > 0:
+            mask &= np.isin(candidates, allow_arr)
+        if block_arr.size > 0:
+            mask &= np.isin(candidates, block_arr, invert=True)
+        return mask if return_mask else candidates[mask]
+
+    allow_set = _to_set(allow_list)
+    block_set = _to_set(block_list)
+
+    if allow_set:
+        # allowable ones must be in allow_list and not in block_list
+        allowed = allow_set - block_set if block_set else allow_set
+        if return_mask:
+            return [x in allowed for x in candidates]
+        return [x for x in candidates if x in allowed]
+    elif block_set:
+        if return_mask:
+            return [x not in block_set for x in candidates]
+        return [x for x in candidates if x not in block_set]
+    else:
+        candidates = list(candidates)
+        return [True] * len(candidates) if return_mask else candidates
@@ -0,0 +1,324 @@
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in seconds, each power of 2 is split into 2 ** sub_bucket_bits
+    linear buckets, so percentiles have a relative error of at most 1 / 2 ** sub_bucket_bits (about 3% by default),
+    with a fixed memory. Recording is lock-free, values are appended to a buffer (deque.append is atomic),
+    which is aggregated into buckets in batch under a lock every flush_size values or on reading
+    """
+
+    def __init__(self, min_value: float = 1e-9, max_value: float = 3600, sub_bucket_bits: int = 5,
+                 flush_size: int = 1024):
+        if not 0 < min_value < max_value:
+            raise ValueError('min_value and max_value should be: 0 < min_value < max_value')
+        self.min_value, self.max_value = min_value, max_value
+        self.flush_size = flush_size
+        self._sub_bucket_num = 1 << sub_bucket_bits
+        self._min_exp = math.frexp(min_value)[1]
+        self._bucket_num = (math.frexp(max_value)[1] - self._min_exp + 1) * self._sub_bucket_num
+        self._lock = threading.Lock()
+        self._pending: Deque[float] = deque()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._counts = [0] * self._bucket_num
+            self._count = 0
+            self._sum = 0.0
+            self._min: Optional[float] = None
+            self._max: Optional[float] = None
+
+    def record(self, value: float) -> None:
+        pending = self._pending
+        pending.append(value)
+        if len(pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending = self._pending
+            # popleft is atomic, values appended concurrently are kept for the next flush
+            popleft = pending.popleft
+            values = [popleft() for __ in range(len(pending))]
+            if not values:
+                return
+            counts, last_idx = self._counts, self._bucket_num - 1
+            # same as (exp - min_exp) * sub_bucket_num + int((mantissa - 0.5) * 2 * sub_bucket_num),
+            # for mantissa in [0.5, 1)
+            sub_bucket_num, scale = self._sub_bucket_num, 2 * self._sub_bucket_num
+            base = -(self._min_exp + 1) * sub_bucket_num
+            for mantissa, exp in map(math.frexp, values):
+                if mantissa <= 0:
+                    # zero or negative
+                    idx = 0
+                else:
+                    idx = exp * sub_bucket_num + int(mantissa * scale) + base
+                    if idx < 0:
+                        idx = 0
+                    elif idx > last_idx:
+                        idx = last_idx
+                counts[idx] += 1
+            self._count += len(values)
+            self._sum += sum(values)
+            batch_min, batch_max = min(values), max(values)
+            self._min = batch_min if self._min is None else min(self._min, batch_min)
+            self._max = batch_max if self._max is None else max(self._max, batch_max)
+
+    @property
+    def count(self) -> int:
+        self.flush()
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        self.flush()
+        return self._sum
+
+    @property
+    def min(self) -> Optional[float]:
+        self.flush()
+        return self._min
+
+    @property
+    def max(self) -> Optional[float]:
+        self.flush()
+        return self._max
+
+    def _bucket_upper_bound(self, idx: int) -> float:
+        exp, sub_idx = divmod(idx, self._sub_bucket_num)
+        return math.ldexp(0.5 + (sub_idx + 1) / (2 * self._sub_bucket_num), exp + self._min_exp)
+
+    def percentiles(self, *percents: float) -> List[Optional[float]]:
+        """values at percents (0-100), upper bounds of the buckets, capped by the max recorded value"""
+        self.flush()
+        with self._lock:
+            counts, total, max_value = list(self._counts), self._count, self._max
+        if total == 0:
+            return [None] * len(percents)
+        res = []
+        for percent in percents:
+            target = max(math.ceil(percent / 100 * total), 1)
+            cumulative = 0
+            for idx, count in enumerate(counts):
+                cumulative += count
+                if cumulative >= target:
+                    res.append(min(self._bucket_upper_bound(idx), max_value))
+                    break
+        return res
+
+    def percentile(self, percent: float) -> Optional[float]:
+        return self.percentiles(percent)[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        with self._lock:
+            count, total, min_value, max_value = self._count, self._sum, self._min, self._max
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else None,
+            'min': min_value,
+            'max': max_value,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+        }
+
+    def to_prometheus(self, name: str, labels: Optional[Dict[str, str]] = None) -> str:
+        """text exposition format of Prometheus, as a summary with quantiles 0.5, 0.95, 0.99"""
+        labels = labels or {}
+
+        def format_labels(extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            items = [*labels.items(), *extra]
+            if not items:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+        snapshot = self.snapshot()
+        lines = [f'# TYPE {name} summary']
+        for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+            value = snapshot[key]
+            lines.append(f'{name}{format_labels((("quantile", quantile),))} {"NaN" if value is None else value}')
+        lines.append(f'{name}_sum{format_labels()} {snapshot["sum"]}')
+        lines.append(f'{name}_count{format_labels()} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(path: str, histograms: Dict[str, LatencyHistogram]) -> None:
+    """
+    Dump histograms (metric name -> histogram) to path, e.g. for the textfile collector of node_exporter,
+    the file is replaced atomically so that a reader never sees a partial one
+    """
+    content = ''.join(histogram.to_prometheus(name) for name, histogram in histograms.items())
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix='.prometheus-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def logging_sink(logger: Optional[logging.Logger] = None,
+                 level: int = logging.WARNING) -> Callable[[Callable, float, tuple, dict], None]:
+    """sink for duration, which logs slow calls, args and kwargs are formatted only if the level is enabled"""
+    logger = logger or logging.getLogger('pythonic_toolbox.duration')
+
+    def sink(func: Callable, seconds: float, args: tuple, kwargs: dict) -> None:
+        if logger.isEnabledFor(level):
+            logger.log(level, '%s took %.3f second(s) args %s, kwargs %s', func.__name__, seconds, args, kwargs)
+
+    return sink
+
+
+if sys.version_info >= (3, 7):
+    from contextvars import ContextVar
+
+
+    class _CurrentSpan:
+        def __init__(self, name: str):
+            self._var: ContextVar = ContextVar(name, default=None)
+
+        def get(self) -> Optional['Span']:
+            return self._var.get()
+
+        def set(self, span: 'Span') -> Any:
+            return self._var.set(span)
+
+        def reset(self, token: Any) -> None:
+            self._var.reset(token)
+else:
+    import asyncio
+    import weakref
+
+
+    class _CurrentSpan:
+        # contextvars is not available before python3.7, the current span is kept per asyncio task,
+        # or per thread outside of tasks. Tasks don't inherit it, spans in a new task (e.g. created by
+        # asyncio.gather) start new trees instead of being nested under the span of the creating task
+        def __init__(self, name: str):
+            self._local = threading.local()
+            self._task_spans: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+        @staticmethod
+        def _current_task() -> Optional[asyncio.Task]:
+            try:
+                return asyncio.Task.current_task()
+            except RuntimeError:
+                # no event loop in this thread
+                return None
+
+        def get(self) -> Optional['Span']:
+            task = self._current_task()
+            if task is None:
+                return getattr(self._local, 'span', None)
+            return self._task_spans.get(task)
+
+        def set(self, span: Optional['Span']) -> Any:
+            prev, task = self.get(), self._current_task()
+            if task is None:
+                self._local.span = span
+            else:
+                self._task_spans[task] = span
+            return prev
+
+        def reset(self, token: Any) -> None:
+            self.set(token)
+
+
+class Span:
+    __slots__ = ('name', 'parent', 'children', 'start', 'end', 'thread_id', 'token')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None):
+        self.name = name
+        self.parent = parent
+        self.children: List['Span'] = []
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.token: Any = None
+
+    @property
+    def total_time(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def self_time(self) -> float:
+        """total time excluding children, children running concurrently (e.g. by asyncio.gather) may overlap"""
+        return max(self.total_time - sum(child.total_time for child in self.children), 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'total_time': self.total_time,
+            'self_time': self.self_time,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+class SpanTracer:
+    """
+    Collect spans of nested calls as trees, the current span is kept in contextvars, so that calls in
+    threads or asyncio tasks get their parents right (before python3.7, spans in a new task start new trees).
+    At most max_roots recent trees are kept
+    """
+
+    def __init__(self, max_roots: int = 1000):
+        self.roots: Deque[Span] = deque(maxlen=max_roots)
+        self._current = _CurrentSpan(f'span_tracer_{id(self)}')
+        self._origin = time.perf_counter()
+
+    def start_span(self, name: str) -> Span:
+        parent = self._current.get()
+        span = Span(name, parent)
+        # both list.append and deque.append are atomic
+        if parent is None:
+            self.roots.append(span)
+        else:
+            parent.children.append(span)
+        span.token = self._current.set(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        span.end = time.perf_counter()
+        self._current.reset(span.token)
+        span.token = None
+
+    def clear(self) -> None:
+        self.roots.clear()
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """trace event format of Chrome, which can be viewed in chrome://tracing, Perfetto or speedscope"""
+        pid, events = os.getpid(), []
+        stack = list(self.roots)
+        while stack:
+            span = stack.pop()
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': (span.start - self._origin) * 1e6,
+                'dur': span.total_time * 1e6,
+                'pid': pid,
+                'tid': span.thread_id,
+            })
+            stack.extend(span.children)
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump_chrome_trace(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
@@ -0,0 +1,184 @@
+"""
+Micro benchmarks for the performance sensitive utils, not collected by pytest, run it manually:
+
+python3 tests/benchmark.py
+"""
+import timeit
+
+
+def best_of(func, number=1, repeat=5) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def benchmark_StrKeyIdDict():
+    from pythonic_toolbox.utils.dict_utils import StrKeyIdDict, IntKeyIdDict
+
+    num = 100000
+    int_ids = list(range(0, num))
+    str_ids = list(map(str, int_ids))
+    for cls in (StrKeyIdDict, IntKeyIdDict):
+        my_dict = cls.from_items((i, i) for i in int_ids)
+        for id_type, ids in (('int', int_ids), ('str', str_ids)):
+            cost = best_of(lambda: [my_dict[i] for i in ids])
+            print(f'{cls.__name__} lookup {id_type} ids: {num / cost / 1e6:.2f}M ops/s')
+            cost = best_of(lambda: my_dict.get_many(ids))
+            print(f'{cls.__name__} get_many {id_type} ids: {num / cost / 1e6:.2f}M ops/s')
+
+
+def benchmark_sort_with_custom_orders():
+    import random
+
+    from pythonic_toolbox.utils.list_utils import CustomOrder, sort_with_custom_orders
+
+    num = 100000
+    values = [{'product_id': i, 'category': f'category{random.randint(0, 100)}'} for i in range(0, num)]
+    prefix_orders = [{'category': f'category{i}'} for i in range(0, 10)]
+    suffix_orders = [{'category': f'category{i}'} for i in range(90, 100)]
+
+    def category(item):
+        return item['category']
+
+    cost = best_of(lambda: sort_with_custom_orders(values, prefix_orders, suffix_orders, key=category))
+    print(f'sort_with_custom_orders {num} dicts: {cost * 1000:.1f}ms')
+    custom_order = CustomOrder(prefix_orders, suffix_orders, key=category)
+    cost = best_of(lambda: custom_order.sort(values))
+    print(f'CustomOrder.sort {num} dicts: {cost * 1000:.1f}ms')
+    cost = best_of(lambda: custom_order.sort(values, limit=20))
+    print(f'CustomOrder.sort top 20 of {num} dicts: {cost * 1000:.1f}ms')
+
+
+def benchmark_filter_allowable():
+    import random
+
+    from pythonic_toolbox.utils.list_utils import filter_allowable, filter_allowable_batch
+
+    num = 1000000
+    ids = [random.randint(0, num) for __ in range(0, num)]
+    allow_list = random.sample(range(0, num), num // 2)
+    block_list = random.sample(range(0, num), num // 10)
+    cost = best_of(lambda: list(filter_allowable(ids, allow_list, block_list)), repeat=3)
+    print(f'filter_allowable {num} ids: {cost * 1000:.1f}ms')
+    cost = best_of(lambda: filter_allowable_batch(ids, allow_list, block_list), repeat=3)
+    print(f'filter_allowable_batch {num} ids: {cost * 1000:.1f}ms')
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    ids_arr, allow_arr, block_arr = np.array(ids), np.array(allow_list), np.array(block_list)
+    cost = best_of(lambda: filter_allowable_batch(ids_arr, allow_arr, block_arr), repeat=3)
+    print(f'filter_allowable_batch {num} ids (numpy): {cost * 1000:.1f}ms')
+
+
+def benchmark_unpack_list():
+    from array import array
+
+    from pythonic_toolbox.utils.list_utils import unpack_list
+
+    num = 100000
+    records = [(i, i + 1) for i in range(0, num)]
+    cost = best_of(lambda: [unpack_list(record, target_num=3, default=0) for record in records])
+    print(f'unpack_list {num} tuples: {num / cost / 1e6:.2f}M ops/s')
+    buffer = memoryview(array('i', range(0, num * 4)))
+    cost = best_of(lambda: [unpack_list(buffer[i:i + 4], target_num=4) for i in range(0, num * 4, 4)])
+    print(f'unpack_list {num} memoryview records: {num / cost / 1e6:.2f}M ops/s')
+
+
+def benchmark_deque_pop_any():
+    import random
+    from collections import deque
+
+    from pythonic_toolbox.utils.deque_utils import IndexedDeque, deque_pop_any
+
+    num, pop_num, repeat = 1000000, 1000, 3
+    # the same queue is popped in every repetition, indices stay in range after all of them
+    indices = [random.randint(0, num - repeat * pop_num - 1) for __ in range(0, pop_num)]
+    for queue_cls in (deque, IndexedDeque):
+        queue = queue_cls(range(0, num))
+        cost = best_of(lambda: [deque_pop_any(queue, idx) for idx in indices], repeat=repeat)
+        print(f'deque_pop_any on {num} {queue_cls.__name__}: {pop_num / cost / 1e3:.1f}K ops/s')
+
+
+def benchmark_deque_split():
+    from collections import deque
+
+    from pythonic_toolbox.utils.deque_utils import IndexedDeque, deque_split
+
+    num = 1000000
+    queue = deque(range(0, num))
+    cost = best_of(lambda: deque_split(queue, num // 2), repeat=3)
+    print(f'deque_split on {num} deque: {cost * 1000:.3f}ms')
+
+    queue = IndexedDeque(range(0, num))
+
+    def split_and_concat():
+        head, tail = deque_split(queue, num // 2)
+        head.concat(tail)
+
+    cost = best_of(split_and_concat, repeat=3)
+    print(f'deque_split + concat on {num} IndexedDeque: {cost * 1000:.3f}ms')
+
+
+def benchmark_SkipContext():
+    from pythonic_toolbox.utils.context_utils import SkipContext
+
+    def calls():
+        for __ in range(0, 100000):
+            abs(-1)
+            len('')
+
+    def calls_after_skipped_block():
+        with SkipContext(skip=True):
+            calls()
+        calls()
+
+    cost = best_of(calls)
+    print(f'200000 calls: {cost * 1000:.1f}ms')
+    cost = best_of(calls_after_skipped_block)
+    print(f'200000 calls after a skipped block: {cost * 1000:.1f}ms')
+
+
+def benchmark_duration():
+    from pythonic_toolbox.decorators.common import duration
+    from pythonic_toolbox.utils.metric_utils import LatencyHistogram
+
+    def handler():
+        pass
+
+    num = 100000
+    base_cost = best_of(lambda: [handler() for __ in range(0, num)])
+    for name, params in (('default', {}),
+                         ('histogram', {'histogram': LatencyHistogram()}),
+                         ('histogram 1% sampled', {'histogram': LatencyHistogram(), 'sample_rate': 0.01})):
+        decorated = duration(**params)(handler)
+        cost = best_of(lambda: [decorated() for __ in range(0, num)])
+        print(f'duration overhead ({name}): {(cost - base_cost) / num * 1e9:.0f}ns per call')
+
+
+def benchmark_ignore_unexpected_kwargs():
+    from pythonic_toolbox.decorators.common import ignore_unexpected_kwargs
+
+    def handler(a, b=0, c=3):
+        return a
+
+    def var_kwargs_handler(a, **kwargs):
+        return a
+
+    num = 100000
+    base_cost = best_of(lambda: [handler(a=1, b=2) for __ in range(0, num)])
+    for name, func, kwargs in (('expected kwargs', handler, {'a': 1, 'b': 2}),
+                               ('unexpected kwargs', handler, {'a': 1, 'b': 2, 'd': 4}),
+                               ('**kwargs', var_kwargs_handler, {'a': 1, 'b': 2})):
+        decorated = ignore_unexpected_kwargs(func)
+        cost = best_of(lambda: [decorated(**kwargs) for __ in range(0, num)])
+        print(f'ignore_unexpected_kwargs overhead ({name}): {(cost - base_cost) / num * 1e9:.0f}ns per call')
+
+
+def main():
+    for name, func in sorted(globals().items()):
+        if name.startswith('benchmark_') and callable(func):
+            print(f'# {name}')
+            func()
+
+
+if __name__ == '__main__':
+    main()
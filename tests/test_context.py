@@ -94,6 +94,47 @@ def test_SkipContext():
 
     assert next(count_iterator) == 0  # check previous context is skipped
 
+    # tracer of the thread (e.g. of debugger, coverage or profiler) is restored after the skipped block,
+    # codes after it run at normal speed
+    import sys
+    prev_trace = sys.gettrace()
+    with SkipContext(skip=True):
+        next(count_iterator)  # this will not be executed
+    assert sys.gettrace() is prev_trace
+
+    def tracer(frame, event, arg):
+        return tracer
+
+    sys.settrace(tracer)
+    try:
+        with MyWorkStation(week_day='Sunday'):
+            next(count_iterator)  # this will not be executed
+        assert sys.gettrace() is tracer
+    finally:
+        sys.settrace(prev_trace)
+
+    # tracer set in C (e.g. CTracer of coverage, used by pytest --cov) doesn't call frame.f_trace,
+    # the block is still skipped
+    import ctypes
+    if hasattr(ctypes, 'pythonapi') and hasattr(ctypes.pythonapi, 'PyEval_SetTrace'):
+        class CTracer:
+            def __call__(self, frame, event, arg):
+                return self
+
+        c_trace_func = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.py_object, ctypes.c_void_p, ctypes.c_int,
+                                        ctypes.c_void_p)(lambda obj, frame, what, arg: 0)
+        c_tracer = CTracer()
+        executed = []
+        ctypes.pythonapi.PyEval_SetTrace.argtypes = [type(c_trace_func), ctypes.py_object]
+        ctypes.pythonapi.PyEval_SetTrace(c_trace_func, c_tracer)
+        try:
+            with SkipContext(skip=True):
+                executed.append(1)  # this will not be executed
+            assert sys.gettrace() is c_tracer
+        finally:
+            sys.settrace(prev_trace)
+        assert executed == []
+
     flg_skip = False
     with SkipContext(skip=flg_skip):
         # codes will be executed as normal, if skip = False
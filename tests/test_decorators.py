@@ -66,8 +66,84 @@ def test_ignore_unexpected_kwargs():
     __ = Person.create(**params)
     assert Person.greetings(**params)
 
+    # signature is inspected once at decoration time, per call overhead is far less than inspecting it per call
+    import inspect
+    import timeit
+
+    number = 2000
+    per_call_overhead = min(timeit.repeat(lambda: wrapped_foo(**dct), number=number, repeat=3)) / number
+    inspect_cost = min(timeit.repeat(lambda: inspect.signature(foo), number=number, repeat=3)) / number
+    assert per_call_overhead < inspect_cost
+
+
+def test_duration():
+    import asyncio
+    import logging
+    import time
+
+    import pytest
+    from pythonic_toolbox.decorators.common import duration
+    from pythonic_toolbox.utils.metric_utils import LatencyHistogram, logging_sink
+
+    # record latencies into a histogram, and report slow calls (0.05s or more) to a sink, instead of print
+    slow_calls = []
+    histogram = LatencyHistogram()
+
+    @duration(time_threshold=0.05, histogram=histogram, sink=lambda *args: slow_calls.append(args))
+    def handler(sleep_seconds):
+        time.sleep(sleep_seconds)
+
+    for __ in range(0, 9):
+        handler(0)
+    handler(sleep_seconds=0.05)
+
+    assert handler.histogram is histogram
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 10 and snapshot['p50'] < 0.01 and snapshot['p99'] >= 0.05
+    assert len(slow_calls) == 1
+    func, seconds, args, kwargs = slow_calls[0]
+    assert func.__name__ == 'handler' and seconds >= 0.05 and args == () and kwargs == {'sleep_seconds': 0.05}
+
+    # only a sample of calls are measured
+    histogram.reset()
+
+    @duration(time_threshold=0, histogram=histogram, sample_rate=0.1)
+    def sampled_handler():
+        pass
+
+    for __ in range(0, 1000):
+        sampled_handler()
+    assert 30 < histogram.count < 300
+
+    # log slow calls
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    logger = logging.getLogger('test_duration')
+    logger.addHandler(ListHandler())
+
+    @duration(time_threshold=0.01, sink=logging_sink(logger, level=logging.WARNING))
+    async def async_handler():
+        await asyncio.sleep(0.01)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_handler())
+    finally:
+        loop.close()
+    assert len(records) == 1 and records[0].startswith('async_handler took')
+
+    with pytest.raises(ValueError) as exec_info:
+        duration(sample_rate=2)(handler)
+    assert exec_info.value.args[0] == 'sample_rate should be in [0, 1]'
+
 
 def test_retry():
+    from itertools import islice
+
     import pytest
 
     from pythonic_toolbox.decorators.common import retry
@@ -184,3 +260,170 @@ def test_retry():
         loop.run_until_complete(async_main_for_always_fail())
     finally:
         loop.close()
+
+    # only retry on the given exceptions, others are raised immediately
+    call_times = 0
+
+    @retry(tries=3, delay=0.01, exceptions=(ConnectionError,))
+    def fetch(error):
+        nonlocal call_times
+        call_times += 1
+        raise error
+
+    with pytest.raises(KeyError):
+        fetch(KeyError())
+    assert call_times == 1
+    call_times = 0
+    with pytest.raises(ConnectionError):
+        fetch(ConnectionError())
+    assert call_times == 4
+
+    # give up once the next retry would start after deadline seconds, here after 3 calls: 0 + 0.1 + 0.2 < 0.5
+    call_times = 0
+
+    @retry(tries=10, delay=0.1, factor=2, deadline=0.5)
+    def fetch_with_deadline():
+        nonlocal call_times
+        call_times += 1
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        fetch_with_deadline()
+    assert call_times == 3
+
+    # full/decorrelated jitter spreads the retries of concurrent callers, and max_delay caps each delay
+    from pythonic_toolbox.decorators.common import _backoff_delays
+    assert list(islice(_backoff_delays(1, factor=2, max_delay=5), 5)) == [1, 2, 4, 5, 5]
+    assert all(0 <= d <= 5 for d in islice(_backoff_delays(1, factor=2, jitter='full', max_delay=5), 100))
+    assert all(1 <= d <= 5 for d in islice(_backoff_delays(1, factor=2, jitter='decorrelated', max_delay=5), 100))
+
+    with pytest.raises(ValueError) as exec_info:
+        retry(jitter='unknown')(fetch)
+    assert exec_info.value.args[0] == "jitter should be None, 'full' or 'decorrelated'"
+
+    with pytest.raises(ValueError) as exec_info:
+        retry(tries=-1)(fetch)
+    assert exec_info.value.args[0] == 'tries should be non-negative integer'
+
+    # backoff of async func doesn't block the event loop, other coroutines keep running meanwhile
+    ticks = 0
+
+    @retry(tries=2, delay=0.1, jitter='full')
+    async def async_fetch():
+        raise ConnectionError()
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    async def async_main_for_backoff():
+        ticker_task = asyncio.ensure_future(ticker())
+        with pytest.raises(ConnectionError):
+            await async_fetch()
+        ticker_task.cancel()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main_for_backoff())
+    finally:
+        loop.close()
+    assert ticks > 1
+
+
+def test_RetryBudget():
+    import pytest
+    from pythonic_toolbox.decorators.common import RetryBudget, retry
+
+    # retries are at most about 10% of calls, besides 2 initial tokens, shared by all functions using the budget
+    budget = RetryBudget(ratio=0.1, initial_tokens=2)
+    call_times = 0
+
+    @retry(tries=3, delay=0, budget=budget)
+    def fetch():
+        nonlocal call_times
+        call_times += 1
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        fetch()
+    # 1 call + 2 retries, 1 retry rejected since 2.1 tokens are used up
+    assert call_times == 3
+    assert budget.calls == 1 and budget.retries == 2 and budget.rejected_retries == 1
+
+    call_times = 0
+    for __ in range(0, 20):
+        with pytest.raises(ConnectionError):
+            fetch()
+    # 20 calls deposit 2 tokens, only 2 retries allowed instead of 3 * 20
+    assert call_times == 22
+
+
+def test_circuit_breaker():
+    import asyncio
+    import time
+
+    import pytest
+    from pythonic_toolbox.decorators.common import CircuitBreaker, CircuitBreakerOpenError, circuit_breaker, retry
+
+    backend_down = True
+    call_times = 0
+
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.2)
+
+    # put circuit_breaker inside retry
+    @retry(tries=5, delay=0.1)
+    @circuit_breaker(breaker=breaker)
+    def fetch():
+        nonlocal call_times
+        call_times += 1
+        if backend_down:
+            raise ConnectionError()
+        return 'ok'
+
+    # opened after 2 failures, the call opening it raises CircuitBreakerOpenError from the original exception,
+    # retry stops immediately without sleeping again
+    start = time.perf_counter()
+    with pytest.raises(CircuitBreakerOpenError) as exec_info:
+        fetch()
+    assert time.perf_counter() - start < 0.18  # only slept once between the 2 calls
+    assert isinstance(exec_info.value.__cause__, ConnectionError)
+    assert call_times == 2
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_count == 1
+    assert fetch.circuit_breaker is breaker
+
+    # fail fast while opened
+    with pytest.raises(CircuitBreakerOpenError):
+        fetch()
+    assert call_times == 2 and breaker.rejected_count == 1
+
+    # a trial call is let through after recovery_timeout, and closes the breaker if succeeded
+    time.sleep(0.2)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    backend_down = False
+    assert fetch() == 'ok'
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failure_count == 0
+
+    # async functions, and exceptions not counted as failures
+    @circuit_breaker(failure_threshold=1, exceptions=(ConnectionError,))
+    async def async_fetch(error=None):
+        if error is not None:
+            raise error
+        return 'ok'
+
+    async def async_main():
+        with pytest.raises(KeyError):
+            await async_fetch(KeyError())
+        assert async_fetch.circuit_breaker.state == CircuitBreaker.CLOSED
+        with pytest.raises(CircuitBreakerOpenError):
+            await async_fetch(ConnectionError())
+        with pytest.raises(CircuitBreakerOpenError):
+            await async_fetch()
+        assert async_fetch.circuit_breaker.rejected_count == 1
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main())
+    finally:
+        loop.close()
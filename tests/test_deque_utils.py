@@ -51,3 +51,195 @@ def test_deque_pop_any():
     with pytest.raises(IndexError) as exec_info:
         deque_pop_any(queue, idx=0)
     assert exec_info.value.args[0] == 'pop from empty deque'
+
+
+def test_IndexedDeque():
+    from collections import deque
+
+    import pytest
+    from pythonic_toolbox.utils.deque_utils import IndexedDeque, deque_pop_any, deque_split
+
+    # deque-like operations at both ends
+    queue = IndexedDeque([2, 3, 4], block_size=2)
+    queue.append(5)
+    queue.appendleft(1)
+    assert list(queue) == [1, 2, 3, 4, 5] and len(queue) == 5
+    assert queue.popleft() == 1 and queue.pop() == 5
+    queue.extend([5, 6])
+    queue.extendleft([1, 0])  # same as deque.extendleft, in reversed order
+    assert queue == deque([0, 1, 2, 3, 4, 5, 6])
+
+    # index access, insert_at and pop_at at arbitrary positions in O(log n)
+    assert queue[3] == 3 and queue[-1] == 6
+    queue[3] = 'three'
+    assert queue.pop_at(3) == 'three'
+    queue.insert_at(3, 3)
+    assert queue.pop_at(-2) == 5
+    queue.insert_at(100, 7)  # same as list.insert, index out of range is clamped
+    assert queue == IndexedDeque([0, 1, 2, 3, 4, 6, 7])
+
+    # works with deque_pop_any and deque_split
+    assert deque_pop_any(queue, idx=5) == 6
+    # IndexedDeque is split in place by moving blocks instead of copying items
+    queue1, queue2 = deque_split(queue, num=3)
+    assert queue1 is queue and isinstance(queue2, IndexedDeque)
+    assert queue1 == deque([0, 1, 2]) and queue2 == deque([3, 4, 7])
+
+    # split and concat cost O(block_size + number of blocks), items of the other are moved
+    queue = IndexedDeque(range(0, 10), block_size=4)
+    tail = queue.split(5)
+    assert queue == IndexedDeque([0, 1, 2, 3, 4]) and tail == IndexedDeque([5, 6, 7, 8, 9])
+    assert len(queue.split(100)) == 0
+    queue.concat(tail)
+    assert queue == IndexedDeque(range(0, 10)) and len(tail) == 0
+    assert queue[7] == 7
+
+    with pytest.raises(IndexError) as exec_info:
+        queue.pop_at(100)
+    assert exec_info.value.args[0] == 'index out of range'
+
+    with pytest.raises(IndexError) as exec_info:
+        deque_pop_any(IndexedDeque(), idx=0)
+    assert exec_info.value.args[0] == 'pop from empty deque'
+
+    with pytest.raises(IndexError):
+        IndexedDeque().popleft()
+
+
+def test_WorkStealingDeque():
+    import threading
+    from collections import deque
+
+    import pytest
+    from pythonic_toolbox.utils.deque_utils import WorkStealingDeque
+
+    jobs = WorkStealingDeque([1, 2, 3, 4, 5])
+    # owner pushes and pops at the right end
+    jobs.push(6)
+    assert jobs.pop() == 6
+    # thieves steal the oldest half (rounded up) by default, or at most num items
+    assert jobs.steal() == deque([1, 2, 3])
+    assert jobs.steal(num=1) == deque([4])
+    assert jobs.steal(num=100) == deque([5])
+    assert jobs.steal() == deque() and len(jobs) == 0
+    with pytest.raises(IndexError):
+        jobs.pop()
+    with pytest.raises(ValueError) as exec_info:
+        jobs.steal(num=-1)
+    assert exec_info.value.args[0] == 'num must be integer: 0 <= num <= sys.maxsize'
+
+    # each job is taken exactly once when the owner and thieves work concurrently
+    num = 100000
+    jobs = WorkStealingDeque()
+    taken_by_owner, taken_by_thieves = [], []
+
+    def owner():
+        for i in range(num):
+            jobs.push(i)
+            if i % 3 == 0:
+                try:
+                    taken_by_owner.append(jobs.pop())
+                except IndexError:
+                    pass
+
+    def thief():
+        while owner_thread.is_alive() or len(jobs):
+            taken_by_thieves.extend(jobs.steal(num=10))
+
+    owner_thread = threading.Thread(target=owner)
+    thief_threads = [threading.Thread(target=thief) for __ in range(3)]
+    owner_thread.start()
+    for thread in thief_threads:
+        thread.start()
+    owner_thread.join()
+    for thread in thief_threads:
+        thread.join()
+    assert sorted(taken_by_owner + taken_by_thieves) == list(range(num))
+
+
+def test_AsyncWorkStealingDeque():
+    import asyncio
+    from collections import deque
+
+    from pythonic_toolbox.utils.deque_utils import AsyncWorkStealingDeque
+
+    async def async_main():
+        jobs = AsyncWorkStealingDeque([1, 2, 3])
+        assert await jobs.get() == 3
+        assert jobs.steal() == deque([1])
+        assert jobs.get_nowait() == 2
+
+        # get waits until a job is put
+        getter = asyncio.ensure_future(jobs.get())
+        await asyncio.sleep(0.01)
+        assert not getter.done()
+        jobs.put_nowait(4)
+        assert await getter == 4
+
+        # a cancelled getter doesn't lose the job
+        getter1, getter2 = asyncio.ensure_future(jobs.get()), asyncio.ensure_future(jobs.get())
+        await asyncio.sleep(0.01)
+        getter1.cancel()
+        jobs.put_nowait(5)
+        assert await getter2 == 5
+
+    loop = asyncio.get_event_loop()
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main())
+    finally:
+        loop.close()
+
+
+def test_SpillDeque():
+    import json
+
+    import pytest
+    from pythonic_toolbox.utils.deque_utils import SpillDeque, deque_pop_any, deque_split
+
+    # keep at most about 1KB of items in memory, the rest in the middle are spilled to a temporary file
+    with SpillDeque(range(0, 1000), max_memory_bytes=1024) as queue:
+        assert len(queue) == 1000
+        assert queue.memory_bytes <= 1024 and queue.spilled_num > 900
+        queue.appendleft(-1)
+        queue.append(1000)
+        assert list(queue) == list(range(-1, 1001))
+
+        # spilled items are loaded back in batches when reached from either end
+        assert [queue.popleft() for __ in range(0, 500)] == list(range(-1, 499))
+        assert [queue.pop() for __ in range(0, 100)] == list(range(1000, 900, -1))
+
+        # works with deque_pop_any and deque_split
+        assert deque_pop_any(queue, idx=200) == 699
+        queue1, queue2 = deque_split(queue, num=100)
+        with queue1, queue2:
+            assert isinstance(queue1, SpillDeque) and isinstance(queue2, SpillDeque)
+            assert list(queue1) == list(range(499, 599))
+            assert list(queue2) == [*range(599, 699), *range(700, 901)]
+
+    # disk usage is bounded by the spilled items instead of the total throughput,
+    # e.g. a producer/consumer queue holding about 2000 items
+    with SpillDeque(range(0, 2000), max_memory_bytes=1024) as queue:
+        disk_bytes = []
+        for rounds in (10000, 40000):
+            for i in range(0, rounds):
+                queue.append(i)
+                queue.popleft()
+            disk_bytes.append(queue.disk_bytes)
+        assert len(queue) == 2000 and disk_bytes[1] <= disk_bytes[0] * 1.5
+
+    # pluggable codec, which dumps/loads a list of items
+    queue = SpillDeque(max_memory_bytes=1024, dumps=lambda items: json.dumps(items).encode(), loads=json.loads)
+    queue.extend({'id': i} for i in range(0, 100))
+    assert queue.spilled_num > 0
+    assert queue.popleft() == {'id': 0} and queue.pop() == {'id': 99}
+    queue.close()
+
+    with pytest.raises(IndexError) as exec_info:
+        deque_pop_any(SpillDeque(), idx=0)
+    assert exec_info.value.args[0] == 'pop from empty deque'
+
+    with pytest.raises(ValueError) as exec_info:
+        SpillDeque(max_memory_bytes=0)
+    assert exec_info.value.args[0] == 'max_memory_bytes should be positive integer'
@@ -151,6 +151,108 @@ def test_unique_list_of_dicts():
     assert unique_list_of_dicts([]) == []
 
 
+def test_group_list_of_dicts():
+    import pytest
+    from pythonic_toolbox.utils.dict_utils import group_list_of_dicts
+
+    dict_lst = [
+        {'name': 'Tony Stark', 'sex': 'male', 'age': 49, 'team': 'Avengers'},
+        {'name': 'Peter Parker', 'sex': 'male', 'age': 16, 'team': 'Avengers'},
+        {'name': 'Carol Danvers', 'sex': 'female', 'team': 'Avengers'},
+        {'name': 'Natasha Romanoff', 'sex': 'female', 'age': 35, 'team': 'Avengers'},
+        {'name': 'Reed Richards', 'sex': 'male', 'age': 40, 'team': 'Fantastic Four'},
+    ]
+
+    # groups are returned in first-seen order, with only keys in "by"
+    assert group_list_of_dicts(dict_lst, by=['team']) == [{'team': 'Avengers'}, {'team': 'Fantastic Four'}]
+
+    # aggregate function is applied to values of the same key in each group
+    assert group_list_of_dicts(dict_lst, by=['sex'], aggs={'age': max}) == [
+        {'sex': 'male', 'age': 49},
+        {'sex': 'female', 'age': 35},  # Carol Danvers has no age info, not counted in
+    ]
+
+    # use (source key, aggregate function) pair to aggregate one key in multi ways
+    assert group_list_of_dicts(dict_lst, by=['team', 'sex'],
+                               aggs={'headcount': ('name', len), 'names': ('name', list)}) == [
+        {'team': 'Avengers', 'sex': 'male', 'headcount': 2, 'names': ['Tony Stark', 'Peter Parker']},
+        {'team': 'Avengers', 'sex': 'female', 'headcount': 2, 'names': ['Carol Danvers', 'Natasha Romanoff']},
+        {'team': 'Fantastic Four', 'sex': 'male', 'headcount': 1, 'names': ['Reed Richards']},
+    ]
+
+    # rows missing the key in "by" are grouped with val_for_missing_key
+    assert group_list_of_dicts(dict_lst, by=['age'], aggs={'cnt': ('name', len)},
+                               val_for_missing_key='Unknown')[2] == {'age': 'Unknown', 'cnt': 1}
+
+    # if all rows of a group miss the source key, val_for_missing_key is used instead of aggregating nothing
+    assert group_list_of_dicts(dict_lst, by=['name'], aggs={'age': max}, val_for_missing_key='Unknown')[2] == \
+           {'name': 'Carol Danvers', 'age': 'Unknown'}
+
+    # any iterable (e.g. generator) can be grouped in a single pass
+    assert group_list_of_dicts((d for d in dict_lst), by=['team'], aggs={'total_age': ('age', sum)}) == [
+        {'team': 'Avengers', 'total_age': 100},
+        {'team': 'Fantastic Four', 'total_age': 40},
+    ]
+
+    # edge cases
+    assert group_list_of_dicts([], by=['team'], aggs={'age': max}) == []
+
+    with pytest.raises(ValueError):
+        group_list_of_dicts(dict_lst, by=[])
+
+    with pytest.raises(ValueError):
+        group_list_of_dicts(dict_lst, by=['team'], aggs={'age': 'max'})
+
+
+def test_join_list_of_dicts():
+    import pytest
+    from pythonic_toolbox.utils.dict_utils import join_list_of_dicts
+
+    heroes = [
+        {'name': 'Tony Stark', 'team_id': 1},
+        {'name': 'Reed Richards', 'team_id': 2},
+        {'name': 'Wade Wilson', 'team_id': None},
+        {'name': 'Logan'},
+    ]
+    teams = [
+        {'team_id': 1, 'team': 'Avengers'},
+        {'team_id': 2, 'team': 'Fantastic Four'},
+        {'team_id': 2, 'team': 'Future Foundation'},
+        {'team_id': 3, 'team': 'X-Men'},
+    ]
+
+    assert join_list_of_dicts(heroes, teams, on=['team_id']) == [
+        {'name': 'Tony Stark', 'team_id': 1, 'team': 'Avengers'},
+        {'name': 'Reed Richards', 'team_id': 2, 'team': 'Fantastic Four'},
+        {'name': 'Reed Richards', 'team_id': 2, 'team': 'Future Foundation'},
+    ]
+
+    # left join keeps rows in left without matches, rows missing the key never match
+    res = join_list_of_dicts(heroes, teams, on=['team_id'], how='left')
+    assert len(res) == 5
+    assert res[-2:] == [{'name': 'Wade Wilson', 'team_id': None}, {'name': 'Logan'}]
+
+    # join on multi keys
+    left = [{'x': 1, 'y': 1, 'val': 'a'}, {'x': 1, 'y': 2, 'val': 'b'}]
+    right = [{'x': 1, 'y': 2, 'other_val': 'c'}]
+    assert join_list_of_dicts(left, right, on=['x', 'y']) == [{'x': 1, 'y': 2, 'val': 'b', 'other_val': 'c'}]
+
+    # new dicts are returned, leaving the original dicts untouched
+    res = join_list_of_dicts(heroes, teams, on=['team_id'])
+    res[0]['name'] = 'Iron Man'
+    assert heroes[0]['name'] == 'Tony Stark'
+
+    # edge cases
+    assert join_list_of_dicts([], teams, on=['team_id']) == []
+    assert join_list_of_dicts(heroes, [], on=['team_id']) == []
+
+    with pytest.raises(ValueError):
+        join_list_of_dicts(heroes, teams, on=[])
+
+    with pytest.raises(ValueError):
+        join_list_of_dicts(heroes, teams, on=['team_id'], how='outer')
+
+
 def test_walk_leaves():
     from pythonic_toolbox.utils.dict_utils import walk_leaves
 
@@ -687,3 +789,90 @@ def test_StrKeyIdDict():
     # delete key 'data', should not affect other keys
     del my_dict['data']
     assert my_dict['1'] == 'a'
+
+    # bulk constructor, validate and build in one pass, from a mapping or (key, value) pairs
+    my_dict = StrKeyIdDict.from_items({1: 'a', 2: 'b', '3': 'c'})
+    assert my_dict == StrKeyIdDict({1: 'a', 2: 'b', '3': 'c'})
+    assert my_dict['1'] == my_dict[1] == 'a'
+    my_dict = StrKeyIdDict.from_items((i, str(i)) for i in range(0, 1000))
+    assert len(my_dict) == 1000 and my_dict[999] == my_dict['999'] == '999'
+
+    # keys are assumed to be pre-stringified if trusted, skip validation for speed
+    my_dict = StrKeyIdDict.from_items([('1', 'a'), ('2', 'b')], trusted=True)
+    assert my_dict[1] == 'a' and my_dict.keys() == {'1', '2'}
+
+    with pytest.raises(TypeError):
+        StrKeyIdDict.from_items([('1', 'a'), (1, 'A')])
+
+    with pytest.raises(TypeError):
+        StrKeyIdDict.from_items({1.0: 'a'})
+
+    # batch operations, keys are converted once per batch
+    my_dict = StrKeyIdDict({1: 'a', 2: 'b', '3': 'c'})
+    assert my_dict.get_many([1, '2', 3, 4]) == ['a', 'b', 'c', None]
+    assert my_dict.get_many([4, 'NotExistKey'], default='x') == ['x', 'x']
+    assert my_dict.contains_many([1, '2', 4]) == [True, True, False]
+    my_dict.set_many([(4, 'd'), ('5', 'e')])
+    my_dict.set_many({6: 'f'})
+    assert my_dict == {'1': 'a', '2': 'b', '3': 'c', '4': 'd', '5': 'e', '6': 'f'}
+
+    with pytest.raises(TypeError):
+        my_dict.set_many([(7.0, 'g')])
+
+
+def test_IntKeyIdDict():
+    import pytest
+    from pythonic_toolbox.utils.dict_utils import IntKeyIdDict, StrKeyIdDict
+
+    # same usage as StrKeyIdDict, but int-like ID keys are stored as int inside, for int-heavy workloads
+    data = {1: 'a', 2: 'b', '3': 'c', 'some-uuid': 'd'}
+    my_dict = IntKeyIdDict(data)
+    assert my_dict['1'] == my_dict[1] == 'a'
+    assert my_dict[3] == my_dict['3'] == 'c'
+    assert 1 in my_dict and '1' in my_dict and 5 not in my_dict
+    # keys are presented as strings at the boundary
+    assert my_dict.keys() == {'1', '2', '3', 'some-uuid'}
+    assert list(my_dict.items()) == [('1', 'a'), ('2', 'b'), ('3', 'c'), ('some-uuid', 'd')]
+    assert list(my_dict.values()) == ['a', 'b', 'c', 'd']
+    assert dict(my_dict) == {'1': 'a', '2': 'b', '3': 'c', 'some-uuid': 'd'}
+    assert repr(my_dict) == "{'1': 'a', '2': 'b', '3': 'c', 'some-uuid': 'd'}"
+
+    # only canonical decimal strings are treated as int, '01' is a different ID from '1'
+    my_dict['01'] = 'A'
+    assert my_dict['01'] == 'A' and my_dict[1] == 'a'
+    my_dict[-1] = 'minus'
+    assert my_dict['-1'] == 'minus'
+    del my_dict['01']
+    del my_dict[-1]
+
+    my_dict[4] = 'e'
+    assert my_dict['4'] == 'e'
+    del my_dict['4']
+    assert 4 not in my_dict
+
+    with pytest.raises(KeyError):
+        __ = my_dict[100]
+
+    with pytest.raises(TypeError):
+        my_dict[1.0] = 'a'
+
+    with pytest.raises(TypeError):
+        IntKeyIdDict({'1': 'a', 1: 'A'})
+
+    # compare with StrKeyIdDict and plain dict
+    assert IntKeyIdDict(data) == StrKeyIdDict(data)
+    assert StrKeyIdDict(data) == IntKeyIdDict(data)
+    assert IntKeyIdDict(data) == IntKeyIdDict.from_items(data)
+    assert IntKeyIdDict(data) == {'1': 'a', '2': 'b', '3': 'c', 'some-uuid': 'd'}
+    assert IntKeyIdDict.from_items([('1', 'a')], trusted=True)[1] == 'a'
+
+    # batch operations are also supported
+    assert my_dict.get_many([1, '2', 100]) == ['a', 'b', None]
+    assert my_dict.contains_many(['1', 2, 100]) == [True, True, False]
+    my_dict.set_many({4: 'e', '5': 'f'})
+    assert my_dict.get_many(['4', 5]) == ['e', 'f']
+
+    # copy and pop
+    copy_dict = my_dict.copy()
+    assert type(copy_dict) is IntKeyIdDict and copy_dict == my_dict
+    assert copy_dict.pop(1) == 'a' and 1 not in copy_dict and 1 in my_dict
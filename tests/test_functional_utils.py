@@ -34,3 +34,157 @@ def test_filter_multi():
             break
         else:
             assert value == expected[idx]
+
+
+def test_MultiFilter():
+    import pytest
+    from pythonic_toolbox.utils.functional_utils import MultiFilter, lfilter_multi
+
+    def is_even(x):
+        return x % 2 == 0
+
+    def is_divisible_by_5(x):
+        return x % 5 == 0
+
+    # compile predicates once, the filter is also a predicate itself
+    multi_filter = MultiFilter([is_even, is_divisible_by_5])
+    assert multi_filter.lfilter(range(1, 30)) == [10, 20]
+    assert list(multi_filter.filter([5, 10, 15, 20])) == [10, 20]
+    assert multi_filter(10) is True and multi_filter(5) is False
+
+    # collect per-predicate statistics, short-circuited on the first failed predicate
+    multi_filter = MultiFilter([is_even, is_divisible_by_5], collect_stats=True)
+    assert multi_filter.lfilter(range(0, 100)) == lfilter_multi([is_even, is_divisible_by_5], range(0, 100))
+    stats = multi_filter.stats
+    assert [s['name'] for s in stats] == ['is_even', 'is_divisible_by_5']
+    assert stats[0]['calls'] == 100 and stats[0]['passes'] == 50 and stats[0]['pass_rate'] == 0.5
+    assert stats[1]['calls'] == 50 and stats[1]['passes'] == 10  # only even numbers get checked
+    assert all(s['total_time'] > 0 for s in stats)
+    multi_filter.reset_stats()
+    assert multi_filter.stats[0]['calls'] == 0 and multi_filter.stats[0]['pass_rate'] is None
+
+    # adaptive: predicates are reordered by observed pass rate and time cost, results are never changed
+    def is_positive(x):
+        return x > 0  # almost always passes, better to be checked last
+
+    multi_filter = MultiFilter([is_positive, is_even, is_divisible_by_5], adaptive=True, reorder_interval=10)
+    assert multi_filter.lfilter(range(1, 1001)) == lfilter_multi([is_even, is_divisible_by_5], range(1, 1001))
+    assert multi_filter.functions[-1] is is_positive
+    assert multi_filter.stats[-1]['name'] == 'is_positive'
+
+    # edge cases
+    assert MultiFilter([]).lfilter([1, 2, 3]) == [1, 2, 3]
+    assert MultiFilter([is_even], collect_stats=True).lfilter([]) == []
+
+    with pytest.raises(ValueError):
+        MultiFilter([is_even], reorder_interval=0)
+
+
+def test_pfilter_multi():
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import count, takewhile
+
+    import pytest
+    from pythonic_toolbox.utils.functional_utils import lfilter_multi, pfilter_multi
+
+    def is_even(x):
+        return x % 2 == 0
+
+    def is_divisible_by_5(x):
+        return x % 5 == 0
+
+    # items are split into chunks and filtered in parallel, the order of items is kept
+    numbers = list(range(0, 1000))
+    expected = lfilter_multi([is_even, is_divisible_by_5], numbers)
+    assert pfilter_multi([is_even, is_divisible_by_5], numbers, workers=4, chunksize=64, use_threads=True) == expected
+
+    # by default, a process pool is used for CPU-bound predicates, which must be picklable
+    words = ['Apple', 'banana', 'cherry2', 'durian', 'Elderberry', 'fig']
+    assert pfilter_multi([str.isalpha, str.islower], words, workers=2, chunksize=2) == ['banana', 'durian', 'fig']
+
+    # reuse an existing executor, items can be an iterator
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        even_numbers = takewhile(lambda x: x <= 50, count(start=0, step=2))
+        assert pfilter_multi([is_divisible_by_5], even_numbers, chunksize=4, executor=executor) == [
+            0, 10, 20, 30, 40, 50]
+
+    # chunks are submitted in a bounded window (2 chunks per worker), items are not consumed all up front
+    pulled_num, max_pulled_ahead = 0, 0
+
+    def pulled_numbers():
+        nonlocal pulled_num
+        for x in range(0, 10000):
+            pulled_num += 1
+            yield x
+
+    def record_pulled_ahead(x):
+        nonlocal max_pulled_ahead
+        max_pulled_ahead = max(max_pulled_ahead, pulled_num - x)
+        return True
+
+    assert len(pfilter_multi([record_pulled_ahead], pulled_numbers(), workers=2, chunksize=10,
+                             use_threads=True)) == 10000
+    assert max_pulled_ahead <= (2 * 2 + 1) * 10
+
+    # edge cases
+    assert pfilter_multi([is_even], [], use_threads=True) == []
+
+    with pytest.raises(ValueError):
+        pfilter_multi([is_even], numbers, chunksize=0)
+
+
+def test_afilter_multi():
+    import asyncio
+
+    import pytest
+
+    from pythonic_toolbox.utils.functional_utils import afilter_multi
+
+    in_flight_num, max_in_flight_num = 0, 0
+
+    async def exists_in_remote_cache(x):
+        # simulate IO bound checking, e.g. querying a remote cache
+        nonlocal in_flight_num, max_in_flight_num
+        in_flight_num += 1
+        max_in_flight_num = max(max_in_flight_num, in_flight_num)
+        await asyncio.sleep(0.01 * (x % 3))
+        in_flight_num -= 1
+        return x % 2 == 0
+
+    def is_positive(x):
+        # sync predicates can be mixed with async ones
+        return x > 0
+
+    async def async_range(n):
+        for i in range(n):
+            yield i
+
+    async def async_main():
+        predicates = [is_positive, exists_in_remote_cache]
+        # matched items are yielded in the order of items by default
+        res = [x async for x in afilter_multi(predicates, range(-5, 20), concurrency=4)]
+        assert res == [2, 4, 6, 8, 10, 12, 14, 16, 18]
+        # at most 4 items are checked at the same time
+        assert max_in_flight_num == 4
+
+        # yield matched items as soon as checked, a faster check may come earlier
+        res = [x async for x in afilter_multi(predicates, async_range(20), concurrency=4, ordered=False)]
+        assert sorted(res) == [2, 4, 6, 8, 10, 12, 14, 16, 18]
+
+        # stop early, pending checks are cancelled
+        async for x in afilter_multi(predicates, async_range(20), concurrency=4):
+            assert x == 2
+            break
+
+        with pytest.raises(ValueError) as exec_info:
+            async for __ in afilter_multi(predicates, range(10), concurrency=0):
+                pass
+        assert exec_info.value.args[0] == 'concurrency should be positive integer'
+
+    loop = asyncio.get_event_loop()
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main())
+    finally:
+        loop.close()
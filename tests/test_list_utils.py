@@ -32,6 +32,181 @@ def test_until():
     assert until(numbers, lambda x: x >= 5, default=None, max_iter_num=100) == 5
 
 
+def test_until_batched():
+    from collections import deque
+    from itertools import count
+
+    import pytest
+    from pythonic_toolbox.utils.list_utils import until_batched
+
+    def first_greater_than_10(batch):
+        # returns index of the first matched value in the batch, or None
+        return next((idx for idx, x in enumerate(batch) if x > 10), None)
+
+    counter = count(1, 2)  # generator of odd numbers: 1, 3, 5, 7 ...
+    assert until_batched(counter, first_greater_than_10, batch_size=4) == 11
+    assert until_batched([1, 2, 3], first_greater_than_10, batch_size=2, default=11) == 11
+    assert until_batched([1, 2, 3], first_greater_than_10) is None
+    assert until_batched(None, first_greater_than_10, default=11) == 11
+
+    numbers = [1, 12, 3, 14, 5, 16]
+    assert until_batched(numbers, first_greater_than_10, batch_size=4, max_iter_num=1) is None
+    assert until_batched(numbers, first_greater_than_10, batch_size=4, max_iter_num=2) == 12
+    assert until_batched(count(1), first_greater_than_10, batch_size=3, max_iter_num=10) is None
+    assert until_batched(deque(numbers), first_greater_than_10, batch_size=4) == 12
+
+    with pytest.raises(ValueError) as exec_info:
+        until_batched(numbers, first_greater_than_10, batch_size=0)
+    assert exec_info.value.args[0] == 'batch_size should be positive integer'
+
+    # batches of a numpy array are numpy arrays, which can be checked in a vectorized way
+    np = pytest.importorskip('numpy')
+
+    def first_greater_than_10_vectorized(batch):
+        indices = np.flatnonzero(batch > 10)
+        return indices[0] if len(indices) else None
+
+    arr = np.arange(0, 100000)
+    assert until_batched(arr, first_greater_than_10_vectorized, batch_size=1000) == 11
+    assert until_batched(arr, lambda batch: None, default=-1) == -1
+
+
+def test_auntil():
+    import asyncio
+    from itertools import count
+
+    from pythonic_toolbox.utils.list_utils import auntil
+
+    async def async_range(n):
+        for i in range(n):
+            yield i
+
+    async def is_healthy(endpoint):
+        # simulate probing an endpoint, only even endpoints are healthy
+        await asyncio.sleep(0.01)
+        return endpoint % 2 == 0 and endpoint > 0
+
+    async def async_main():
+        assert await auntil(count(1), is_healthy) == 2
+        assert await auntil(async_range(10), is_healthy) == 2
+        # sync terminate is supported too
+        assert await auntil(async_range(10), lambda x: x > 5) == 6
+        assert await auntil(async_range(10)) == 0
+        assert await auntil([1, 3, 5], is_healthy, default=-1) == -1
+        assert await auntil(None, is_healthy, default=-1) == -1
+
+        # probe 4 endpoints ahead concurrently, still the first healthy one in order is returned
+        assert await auntil(count(1), is_healthy, concurrency=4) == 2
+        assert await auntil(async_range(10), lambda x: x >= 5, max_iter_num=5) is None
+        assert await auntil(async_range(10), lambda x: x >= 5, max_iter_num=6, concurrency=3) == 5
+
+        # async generator of values is closed once a value is found, instead of left suspended
+        closed = []
+
+        async def endpoints():
+            try:
+                for i in count(1):
+                    yield i
+            finally:
+                closed.append(True)
+
+        assert await auntil(endpoints(), is_healthy, concurrency=2) == 2
+        assert closed == [True]
+
+    loop = asyncio.get_event_loop()
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main())
+    finally:
+        loop.close()
+
+
+def test_first_success():
+    import time
+
+    import pytest
+    from pythonic_toolbox.utils.list_utils import first_success
+
+    replicas = {'replica1': None, 'replica2': 'value2', 'replica3': 'value3'}
+
+    def lookup(replica):
+        # simulate a slow lookup, replica1 is down
+        time.sleep(0.2)
+        if replicas[replica] is None:
+            raise TimeoutError(replica)
+        return replicas[replica]
+
+    # replicas are tried one by one by default, like until
+    start = time.perf_counter()
+    assert first_success(replicas, lookup) == 'value2'
+    assert time.perf_counter() - start >= 0.4
+
+    # try 3 replicas concurrently, the result of the first succeeded replica in priority order is returned
+    start = time.perf_counter()
+    assert first_success(replicas, lookup, max_parallel=3) == 'value2'
+    assert time.perf_counter() - start < 0.35
+
+    # terminate checks the result of fn
+    assert first_success(replicas, lookup, max_parallel=2, terminate=lambda v: v == 'value3') == 'value3'
+    assert first_success(replicas, lookup, max_parallel=2, max_iter_num=1, default='miss') == 'miss'
+    assert first_success(['replica1'], lookup, default='miss') == 'miss'
+    assert first_success(None, lookup, default='miss') == 'miss'
+
+    # exceptions not in exceptions are raised
+    with pytest.raises(TimeoutError):
+        first_success(replicas, lookup, max_parallel=2, exceptions=(KeyError,))
+
+    with pytest.raises(ValueError) as exec_info:
+        first_success(replicas, lookup, max_parallel=0)
+    assert exec_info.value.args[0] == 'max_parallel should be positive integer'
+
+
+def test_afirst_success():
+    import asyncio
+    import time
+
+    from pythonic_toolbox.utils.list_utils import afirst_success
+
+    replicas = {'replica1': None, 'replica2': 'value2', 'replica3': 'value3'}
+
+    async def lookup(replica):
+        await asyncio.sleep(0.2)
+        if replicas[replica] is None:
+            raise TimeoutError(replica)
+        return replicas[replica]
+
+    async def async_main():
+        start = time.perf_counter()
+        assert await afirst_success(replicas, lookup, max_parallel=3) == 'value2'
+        assert time.perf_counter() - start < 0.35
+
+        assert await afirst_success(replicas, lookup) == 'value2'
+        assert await afirst_success(replicas, lookup, terminate=lambda v: v == 'value3', max_parallel=2) == 'value3'
+        assert await afirst_success(replicas, lookup, max_iter_num=1, default='miss') == 'miss'
+
+        # async generator of candidates is closed once succeeded, instead of left suspended
+        closed = []
+
+        async def candidates():
+            try:
+                for replica in replicas:
+                    yield replica
+            finally:
+                closed.append(True)
+
+        assert await afirst_success(candidates(), lookup) == 'value2'
+        assert closed == [True]
+
+    loop = asyncio.get_event_loop()
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_main())
+    finally:
+        loop.close()
+
+
 def test_sort_with_custom_orders():
     from operator import itemgetter
     from typing import List
@@ -85,6 +260,20 @@ def test_sort_with_custom_orders():
     expected = [{'branch': 'master', 'commit_id': 'v1.2'}, {'branch': 'develop', 'commit_id': 'v1.3'}]
     assert res == expected
 
+    # only the first k values are needed, use limit to pick them by heap instead of a full sort
+    values = ['branch2', 'branch1', 'branch3', 'master', 'release']
+    assert sort_with_custom_orders(values, prefix_orders=['master', 'release'], limit=3) == [
+        'master', 'release', 'branch1']
+    assert sort_with_custom_orders(values, prefix_orders=['master'], limit=2, reverse=True) == ['release', 'branch3']
+    assert sort_with_custom_orders(values, limit=2) == ['branch1', 'branch2']
+    assert sort_with_custom_orders(values, prefix_orders=['master'], limit=0) == []
+    assert sort_with_custom_orders(values, prefix_orders=['master'], limit=100) == [
+        'master', 'branch1', 'branch2', 'branch3', 'release']
+
+    with pytest.raises(ValueError) as exec_info:
+        sort_with_custom_orders(values, prefix_orders=['master'], limit=-1)
+    assert exec_info.value.args[0] == 'limit should be non-negative integer or None'
+
     # tests for exceptions
     with pytest.raises(ValueError) as exec_info:
         sort_with_custom_orders([1, 2, 3], prefix_orders=[3], suffix_orders=[3])
@@ -128,6 +317,108 @@ def test_sort_with_custom_orders():
     assert sort_with_custom_orders(persons, prefix_orders=[Menglong, Person(4, 'Anyone', 40)]) == expected
 
 
+def test_CustomOrder():
+    from operator import itemgetter
+
+    import pytest
+    from pythonic_toolbox.utils.list_utils import CustomOrder, sort_with_custom_orders
+
+    # build the custom orders once, and reuse it to sort values across calls
+    branch_order = CustomOrder(prefix_orders=['master', 'release'], suffix_orders=['deprecated'])
+    values = ['branch2', 'deprecated', 'branch1', 'release', 'master']
+    expected = ['master', 'release', 'branch1', 'branch2', 'deprecated']
+    assert branch_order.sort(values) == expected
+    assert branch_order.sort(values, reverse=True) == expected[::-1]
+    assert branch_order.sort(['feature', 'master']) == ['master', 'feature']
+    assert branch_order.sort([]) == []
+    # same result as sort_with_custom_orders
+    assert branch_order.sort(values) == sort_with_custom_orders(values, prefix_orders=['master', 'release'],
+                                                                suffix_orders=['deprecated'])
+
+    # top k values, in the same order as the full sort
+    assert branch_order.sort(values, limit=2) == expected[:2]
+    assert branch_order.sort(values, limit=2, reverse=True) == expected[::-1][:2]
+
+    # sort_key can be used with other sorting utils, e.g. sorted, min, max, heapq etc.
+    assert sorted(values, key=branch_order.sort_key) == expected
+    assert min(values, key=branch_order.sort_key) == 'master'
+
+    # with key, and unhashable values in orders
+    branch_info = [{'branch': 'develop', 'commit_id': 'v1.3'},
+                   {'branch': 'master', 'commit_id': 'v1.2'},
+                   {'branch': 'release', 'commit_id': 'v1.1'}]
+    branch_order = CustomOrder(prefix_orders=[{'branch': 'release'}, {'branch': 'master'}], key=itemgetter('branch'))
+    assert [info['branch'] for info in branch_order.sort(branch_info)] == ['release', 'master', 'develop']
+
+    # the sort is stable, values with same key keep the original order
+    branch_order = CustomOrder(prefix_orders=['xx'], key=len)
+    assert branch_order.sort(['a', 'bb', 'c', 'dd']) == ['bb', 'dd', 'a', 'c']
+
+    # without any custom orders, it is the same as sorted
+    assert CustomOrder().sort([3, 1, 2]) == [1, 2, 3]
+    assert CustomOrder(key=lambda x: -x).sort([3, 1, 2]) == [3, 2, 1]
+
+    # tests for exceptions
+    with pytest.raises(ValueError) as exec_info:
+        CustomOrder(prefix_orders=[3], suffix_orders=[3])
+    assert exec_info.value.args[0] == 'prefix and suffix contains same value'
+
+    with pytest.raises(ValueError) as exec_info:
+        CustomOrder(prefix_orders=('master',))
+    assert exec_info.value.args[0] == 'prefix_orders should be a list if provided'
+
+
+def test_external_sort_with_custom_orders():
+    import random
+    from itertools import count, islice
+
+    import pytest
+    from pythonic_toolbox.utils.list_utils import external_sort_with_custom_orders, sort_with_custom_orders
+
+    # values can be an iterator, sorted chunks are spilled to temporary files, and merged lazily
+    values = iter(['branch2', 'branch1', 'branch3', 'master', 'release'])
+    sorted_values = external_sort_with_custom_orders(values, prefix_orders=['master', 'release'], chunk_size=2)
+    assert next(sorted_values) == 'master'
+    assert list(sorted_values) == ['release', 'branch1', 'branch2', 'branch3']
+
+    # same result as sort_with_custom_orders, memory usage is bounded by chunk_size
+    product_ids = [random.randint(0, 100) for __ in range(0, 1000)]
+    prefix_orders, suffix_orders = [3, 2, 1], [0]
+    for reverse in (False, True):
+        expected = sort_with_custom_orders(product_ids, prefix_orders, suffix_orders, reverse=reverse)
+        assert list(external_sort_with_custom_orders(iter(product_ids), prefix_orders, suffix_orders,
+                                                     reverse=reverse, chunk_size=64)) == expected
+
+    # the sort is stable
+    products = [{'id': idx, 'category': category} for idx, category in enumerate('cbacbaab')]
+    res = external_sort_with_custom_orders(products, prefix_orders=[{'category': 'c'}],
+                                           key=lambda p: p['category'], chunk_size=3)
+    assert [p['id'] for p in res] == [0, 3, 2, 5, 6, 1, 4, 7]
+
+    # edge cases
+    assert list(external_sort_with_custom_orders([])) == []
+    assert list(external_sort_with_custom_orders(islice(count(), 5), prefix_orders=[3])) == [3, 0, 1, 2, 4]
+
+    with pytest.raises(ValueError):
+        external_sort_with_custom_orders(product_ids, chunk_size=0)
+
+    # runs are merged as soon as enough of them are spilled, files opened at the same time stay bounded,
+    # e.g. 1000 runs under a limit of 200 opened files
+    import os
+    import sys
+    if sys.platform.startswith('linux'):
+        import resource
+
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (len(os.listdir('/proc/self/fd')) + 200, hard_limit))
+        try:
+            values = [random.randint(0, 100) for __ in range(0, 1000)]
+            assert list(external_sort_with_custom_orders(values, prefix_orders=[3], chunk_size=1)) == \
+                   sort_with_custom_orders(values, prefix_orders=[3])
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+
+
 def test_unpack_list():
     import pytest
     from pythonic_toolbox.utils.list_utils import unpack_list
@@ -185,6 +476,27 @@ def test_unpack_list():
         # ValueError: not enough values to unpack (expected 3, got 2)
         first, second, third = unpack_list([1, 2], target_num=2)
 
+    # sequences are sliced, and padded in bulk
+    first, second, third = unpack_list(('a', 'b'), target_num=3, default='x')
+    assert first == 'a' and second == 'b' and third == 'x'
+    first, second = unpack_list('abc', target_num=2)
+    assert first == 'a' and second == 'b'
+
+    from collections import deque
+    first, second = unpack_list(deque([1, 2, 3]), target_num=2)
+    assert first == 1 and second == 2
+
+    # buffers, e.g. fixed-width records in a binary buffer, memoryview slicing is zero-copy
+    from array import array
+    buffer = memoryview(b'\x01\x02\x03\x04')
+    assert unpack_list(buffer[2:], target_num=3, default=0) == [3, 4, 0]
+    assert unpack_list(buffer.cast('H'), target_num=1) == [0x0201]
+    assert unpack_list(array('i', [1, 2, 3]), target_num=2) == [1, 2]
+
+    np = pytest.importorskip('numpy')
+    first, second, third = unpack_list(np.array([1, 2]), target_num=3, default=0)
+    assert first == 1 and second == 2 and third == 0
+
 
 def test_filter_allowable():
     from pythonic_toolbox.utils.list_utils import filter_allowable
@@ -215,3 +527,86 @@ def test_filter_allowable():
     assert list(filter_allowable(candidates=None)) == []
     assert list(filter_allowable(candidates=[])) == []
     assert list(filter_allowable(candidates=[], allow_list=[], block_list=[])) == []
+
+
+def test_filter_allowable_batch():
+    import pytest
+    from pythonic_toolbox.utils.list_utils import filter_allowable, filter_allowable_batch
+
+    # batch version of filter_allowable for primitive keys, returns a list instead of an iterator
+    fruits = ['apple', 'banana', 'orange']
+    vegetables = ['carrot', 'potato', 'tomato']
+    foods = fruits + vegetables
+
+    assert filter_allowable_batch(foods) == foods
+    assert filter_allowable_batch(foods, allow_list=['apple', 'banana', 'blueberry']) == ['apple', 'banana']
+    assert filter_allowable_batch(foods, block_list=vegetables) == fruits
+    assert filter_allowable_batch(foods, allow_list=['apple', 'carrot'], block_list=vegetables) == ['apple']
+    assert filter_allowable_batch(foods, allow_list={'apple'}, block_list={'apple'}) == []
+    for allow_list, block_list in [([], []), (['apple', 'potato'], []), ([], fruits), (foods, ['potato'])]:
+        assert filter_allowable_batch(foods, allow_list, block_list) == list(
+            filter_allowable(foods, allow_list, block_list))
+
+    # get the mask of allowable candidates instead
+    assert filter_allowable_batch(foods, block_list=vegetables, return_mask=True) == [True] * 3 + [False] * 3
+    assert filter_allowable_batch(foods, allow_list=['apple'], return_mask=True) == [True] + [False] * 5
+    assert filter_allowable_batch(foods, return_mask=True) == [True] * 6
+
+    # edge cases
+    assert filter_allowable_batch() == []
+    assert filter_allowable_batch([], allow_list=['apple'], return_mask=True) == []
+
+    # numpy arrays are filtered by numpy.isin, if numpy is installed
+    np = pytest.importorskip('numpy')
+    ids = np.arange(0, 10)
+    assert filter_allowable_batch(ids, allow_list=[1, 2, 3, 20], block_list=[2]).tolist() == [1, 3]
+    assert filter_allowable_batch(ids, allow_list=np.array([1, 2, 3]), block_list=np.array([2])).tolist() == [1, 3]
+    assert filter_allowable_batch(ids, block_list=range(2, 10)).tolist() == [0, 1]
+    assert filter_allowable_batch(ids, block_list={0, 1}, return_mask=True).tolist() == [False] * 2 + [True] * 8
+    assert filter_allowable_batch(ids).tolist() == list(range(0, 10))
+    # list candidates with numpy arrays as allow_list/block_list
+    assert filter_allowable_batch([1, 2, 3, 4], allow_list=np.array([1, 2, 3]), block_list=np.array([2])) == [1, 3]
+    assert filter_allowable_batch([1, 2, 3, 4], block_list=np.array([], dtype=int)) == [1, 2, 3, 4]
+
+
+def test_AllowBlockFilter():
+    import pickle
+    from operator import itemgetter
+
+    import pytest
+    from pythonic_toolbox.utils.functional_utils import lfilter_multi
+    from pythonic_toolbox.utils.list_utils import AllowBlockFilter, filter_allowable
+
+    fruits = ['apple', 'banana', 'orange']
+    vegetables = ['carrot', 'potato', 'tomato']
+    foods = fruits + vegetables
+
+    # build the filter once in the same semantics of filter_allowable, and reuse it
+    no_vegetable_filter = AllowBlockFilter(block_list=vegetables)
+    assert list(no_vegetable_filter.filter(foods)) == fruits
+    assert list(no_vegetable_filter.filter(['carrot', 'blueberry'])) == ['blueberry']
+
+    allow_filter = AllowBlockFilter(allow_list=['apple', 'carrot'], block_list=vegetables)
+    assert list(allow_filter.filter(foods)) == ['apple']
+    assert list(allow_filter.filter(foods)) == list(filter_allowable(foods, ['apple', 'carrot'], vegetables))
+
+    # the filter itself is a predicate, can be composed with other filters
+    assert allow_filter('apple') is True and allow_filter('carrot') is False
+    assert lfilter_multi([no_vegetable_filter, lambda x: x.startswith('b')], foods) == ['banana']
+
+    # with parameter key
+    first_letter_filter = AllowBlockFilter(allow_list=['a', 'b', 'c'], block_list=['c'], key=itemgetter(0))
+    assert list(first_letter_filter.filter(foods)) == ['apple', 'banana']
+
+    # picklable, so it can be shared across processes
+    restored_filter = pickle.loads(pickle.dumps(first_letter_filter))
+    assert list(restored_filter.filter(foods)) == ['apple', 'banana']
+    assert restored_filter.allow_set == frozenset(['a', 'b', 'c'])
+
+    # edge cases
+    assert list(AllowBlockFilter().filter(foods)) == foods
+    assert list(AllowBlockFilter(allow_list=['apple']).filter()) == []
+
+    # numpy arrays as allow_list/block_list
+    np = pytest.importorskip('numpy')
+    assert list(AllowBlockFilter(allow_list=np.array([1, 2, 3]), block_list=np.array([2])).filter([1, 2, 4])) == [1]
@@ -0,0 +1,112 @@
+def test_LatencyHistogram():
+    import os
+    import tempfile
+
+    import pytest
+    from pythonic_toolbox.utils.metric_utils import LatencyHistogram, write_prometheus_textfile
+
+    histogram = LatencyHistogram()
+    assert histogram.snapshot()['p50'] is None
+
+    # latencies in seconds: 1ms * 90, 10ms * 9, 100ms * 1
+    for latency in [0.001] * 90 + [0.01] * 9 + [0.1]:
+        histogram.record(latency)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100 and snapshot['min'] == 0.001 and snapshot['max'] == 0.1
+    assert snapshot['sum'] == pytest.approx(0.28)
+    # percentiles are upper bounds of log-linear buckets, with a relative error within about 3%
+    assert snapshot['p50'] == pytest.approx(0.001, rel=0.04)
+    assert snapshot['p95'] == pytest.approx(0.01, rel=0.04)
+    assert snapshot['p99'] == pytest.approx(0.01, rel=0.04)
+    assert histogram.percentile(100) == 0.1
+
+    # Prometheus text exposition format, as a summary
+    text = histogram.to_prometheus('http_request_seconds', labels={'handler': 'index'})
+    assert '# TYPE http_request_seconds summary' in text
+    assert 'http_request_seconds_count{handler="index"} 100' in text
+    assert 'http_request_seconds{handler="index",quantile="0.99"}' in text
+
+    # dump to a file atomically, e.g. for the textfile collector of node_exporter
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'metrics.prom')
+        write_prometheus_textfile(path, {'http_request_seconds': histogram})
+        with open(path) as f:
+            assert f.read() == histogram.to_prometheus('http_request_seconds')
+        assert os.listdir(tmp_dir) == ['metrics.prom']
+
+    histogram.reset()
+    assert histogram.count == 0 and histogram.max is None
+
+
+def test_SpanTracer():
+    import asyncio
+    import json
+    import os
+    import sys
+    import tempfile
+    import time
+
+    from pythonic_toolbox.decorators.common import duration
+    from pythonic_toolbox.utils.metric_utils import SpanTracer
+
+    # nested calls decorated by duration with the same tracer build a call tree
+    tracer = SpanTracer()
+
+    @duration(time_threshold=0, tracer=tracer)
+    def load(seconds):
+        time.sleep(seconds)
+
+    @duration(time_threshold=0, tracer=tracer)
+    def handler():
+        load(0.02)
+        load(0.01)
+        time.sleep(0.01)
+
+    handler()
+    handler()
+    assert handler.tracer is tracer
+    assert len(tracer.roots) == 2
+    root = tracer.roots[0]
+    assert root.name.endswith('handler') and [child.name.endswith('load') for child in root.children] == [True, True]
+    # self time excludes time spent in children
+    assert root.total_time >= 0.04 and 0.01 <= root.self_time < root.total_time - 0.03
+    tree = root.to_dict()
+    assert tree['children'][0]['total_time'] >= 0.02 and tree['children'][0]['children'] == []
+
+    # spans are tracked by contextvars, concurrent asyncio tasks get the right parents
+    tracer.clear()
+
+    @duration(time_threshold=0, tracer=tracer)
+    async def fetch(seconds):
+        await asyncio.sleep(seconds)
+
+    @duration(time_threshold=0, tracer=tracer)
+    async def async_handler(num):
+        await asyncio.gather(*[fetch(0.01) for __ in range(0, num)])
+
+    async def main():
+        await asyncio.gather(async_handler(2), async_handler(3))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+    if sys.version_info >= (3, 7):
+        assert sorted(len(root.children) for root in tracer.roots) == [2, 3]
+    else:
+        # no contextvars, spans are kept per task, concurrent tasks don't nest under each other,
+        # but spans in tasks created by gather start new trees
+        assert sorted(root.name.split('.')[-1] for root in tracer.roots) == ['async_handler'] * 2 + ['fetch'] * 5
+
+    # export to Chrome trace event format, viewed in chrome://tracing, Perfetto or speedscope
+    trace = tracer.to_chrome_trace()
+    assert len(trace['traceEvents']) == 2 + 2 + 3
+    event = trace['traceEvents'][0]
+    assert event['ph'] == 'X' and event['name'].endswith('async_handler') and event['dur'] >= 10000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'trace.json')
+        tracer.dump_chrome_trace(path)
+        with open(path) as f:
+            assert json.load(f) == trace